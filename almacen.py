@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+almacen.py
+------------
+
+Almacén en disco (SQLite) de resultados de experimentos, para no repetir
+corridas idénticas: mismo algoritmo con los mismos parámetros, mismo problema
+y misma semilla.
+
+Cada resultado se guarda con una llave que es el hash SHA-1 de una
+descripción JSON canónica (llaves ordenadas) de la corrida, así que la llave
+es la misma entre sesiones y entre máquinas.
+
+Sólo tiene sentido guardar corridas con semilla fija; sin semilla cada corrida
+es distinta y no se debe consultar el almacén.
+
+"""
+
+import hashlib
+import json
+import sqlite3
+
+
+def descripcion(objeto):
+    """
+    Describe un objeto (algoritmo o problema) por su clase y sus atributos
+    públicos escalares. Las funciones se describen por su nombre; los atributos
+    que empiezan con _ (cachés internos) y los que no son escalares (resultados
+    guardados por una corrida anterior, matrices de datos) se ignoran.
+
+    @param objeto: Cualquier objeto
+
+    @return: Un diccionario serializable en JSON
+
+    """
+    atributos = {}
+    for nombre, valor in sorted(vars(objeto).items()):
+        if nombre.startswith('_'):
+            continue
+        if callable(valor):
+            atributos[nombre] = getattr(valor, '__name__', repr(valor))
+        elif isinstance(valor, (int, long, float, basestring, bool, type(None))):
+            atributos[nombre] = valor
+    return {'clase': objeto.__class__.__name__, 'atributos': atributos}
+
+
+def llave(algoritmo, problema, parametros, semilla):
+    """
+    Calcula la llave de una corrida
+
+    @param algoritmo: El objeto (o el nombre) del algoritmo
+    @param problema: El objeto del problema
+    @param parametros: Un diccionario con los parámetros de la corrida
+                       (n_poblacion, n_generaciones, etc.)
+    @param semilla: La semilla del generador aleatorio
+
+    @return: Una cadena hexadecimal
+
+    """
+    if not isinstance(algoritmo, basestring):
+        algoritmo = descripcion(algoritmo)
+    texto = json.dumps({'algoritmo': algoritmo, 'problema': descripcion(problema),
+                        'parametros': parametros, 'semilla': semilla}, sort_keys=True)
+    return hashlib.sha1(texto).hexdigest()
+
+
+class AlmacenResultados(object):
+    """
+    Almacén de resultados en un archivo SQLite
+
+    almacen = AlmacenResultados('resultados.db')
+
+    Los resultados son cualquier valor serializable en JSON (las tuplas se
+    recuperan como listas).
+
+    """
+    def __init__(self, ruta='resultados.db'):
+        self.ruta = ruta
+        self.conexion = sqlite3.connect(ruta)
+        self.conexion.execute('CREATE TABLE IF NOT EXISTS resultados '
+                              '(llave TEXT PRIMARY KEY, resultado TEXT NOT NULL)')
+        self.conexion.commit()
+
+    def __contains__(self, llave):
+        return self.busca(llave) is not None
+
+    def busca(self, llave):
+        """
+        @return: El resultado guardado con esa llave, o None si no existe
+
+        """
+        fila = self.conexion.execute('SELECT resultado FROM resultados WHERE llave = ?',
+                                     (llave,)).fetchone()
+        return None if fila is None else json.loads(fila[0])
+
+    def guarda(self, llave, resultado):
+        """
+        Guarda (o reemplaza) el resultado de una corrida
+
+        @param llave: La llave de la corrida
+        @param resultado: Un valor serializable en JSON
+
+        """
+        self.conexion.execute('INSERT OR REPLACE INTO resultados VALUES (?, ?)',
+                              (llave, json.dumps(resultado)))
+        self.conexion.commit()
+
+    def cierra(self):
+        self.conexion.close()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+barrido.py
+------------
+
+Barrido de parámetros para los algoritmos genéticos, el temple simulado y
+las demás búsquedas locales sobre las n reinas, con poda por mitades
+sucesivas (successive halving).
+
+Todas las configuraciones se prueban primero con pocas repeticiones (semillas);
+en cada ronda sólo sobrevive la mejor fracción 1 / eta de las configuraciones
+y a éstas se les multiplica por eta el número de repeticiones, reutilizando
+las corridas de las rondas anteriores. Las corridas se reparten en un pool de
+procesos.
+
+Ejemplo:
+
+    espacio = {'prob_muta': [0.001, 0.01, 0.05], 'n_poblacion': [50, 100],
+               'n_generaciones': [10, 30]}
+    tabla = barrido('genetico1', espacio, n=16)
+    imprime_tabla(tabla)
+
+"""
+
+import blocales
+import genetico
+import nreinas
+import random
+import time
+from itertools import product
+from multiprocessing import Pool
+
+
+# Parámetros de cada algoritmo y sus valores por default
+PARAMETROS = {'genetico1': {'prob_muta': 0.01, 'n_poblacion': 50, 'n_generaciones': 10},
+              'genetico2': {'prob_muta': 0.01, 'n_poblacion': 50, 'n_generaciones': 10},
+              'temple': {'K': 100, 'delta': 0.01, 'maxit': 1000000},
+              'colinas': {'maxit': 1000000},
+              'tabu': {'maxit': 10000, 'tenencia': 10, 'n_candidatos': None}}
+
+
+def corre(algoritmo, parametros, n, semilla, progreso=None):
+    """
+    Corre una vez un algoritmo sobre las n reinas
+
+    @param algoritmo: Una de las llaves de PARAMETROS
+    @param parametros: Diccionario con los parámetros (ver PARAMETROS)
+    @param n: Número de reinas
+    @param semilla: Semilla del generador aleatorio (None para no fijarla)
+    @param progreso: Función progreso(iteracion, mejor costo), llamada en cada
+                     iteración de las búsquedas locales o generación del genético
+
+    @return: Una tupla (estado, costo, tiempo, evaluaciones), donde evaluaciones
+             es el número de llamadas a costo hechas por el algoritmo
+
+    """
+    p = dict(PARAMETROS[algoritmo])
+    p.update(parametros)
+    problema = nreinas.ProblemaNreinas(n)
+    costo = problema.costo
+    evaluaciones = [0]
+
+    def costo_contado(estado):
+        evaluaciones[0] += 1
+        return costo(estado)
+
+    problema.costo = costo_contado
+    if semilla is not None:
+        random.seed(semilla)
+    tiempo_inicial = time.time()
+    if algoritmo == 'temple':
+        estado = blocales.temple_simulado(problema,
+                                          lambda i: blocales.cal_expon(i, p['K'], p['delta']),
+                                          p['maxit'],
+                                          None if progreso is None else
+                                          lambda i, t, c, c_mejor: progreso(i, c_mejor))
+    elif algoritmo == 'colinas':
+        estado = blocales.descenso_colinas(problema, p['maxit'], progreso)
+    elif algoritmo == 'tabu':
+        estado = blocales.busqueda_tabu(problema, p['maxit'], p['tenencia'], p['n_candidatos'], 0,
+                                        None if progreso is None else
+                                        lambda i, c, c_mejor: progreso(i, c_mejor))
+    else:
+        clase = {'genetico1': genetico.GeneticoPermutaciones1,
+                 'genetico2': genetico.GeneticoPermutaciones2}[algoritmo]
+        estado = clase(p['prob_muta']).busqueda(problema, p['n_poblacion'], p['n_generaciones'],
+                                                progreso=progreso)
+    tiempo = time.time() - tiempo_inicial
+    return estado, costo(estado), tiempo, evaluaciones[0]
+
+
+def _corre(args):
+    algoritmo, parametros, n, semilla = args
+    _, costo, tiempo, _ = corre(algoritmo, parametros, n, semilla)
+    return costo, tiempo
+
+
+def configuraciones(espacio, n_aleatorias=None):
+    """
+    Genera las configuraciones de un espacio de búsqueda
+
+    @param espacio: Diccionario {parámetro: lista de valores}
+    @param n_aleatorias: Si es None se genera la malla completa, si no se
+                         escogen n_aleatorias configuraciones al azar (sin repetir)
+
+    @return: Una lista de diccionarios
+
+    """
+    nombres = sorted(espacio)
+    malla = [dict(zip(nombres, valores)) for valores in product(*[espacio[k] for k in nombres])]
+    if n_aleatorias is not None and n_aleatorias < len(malla):
+        malla = random.sample(malla, n_aleatorias)
+    return malla
+
+
+def resumen(parametros, corridas):
+    """
+    Resume las corridas de una configuración
+
+    @return: Un diccionario con los parámetros, las repeticiones, la tasa de
+             éxito (costo 0), el costo promedio y el tiempo por solución (tiempo
+             total entre número de éxitos, infinito si no hubo éxitos)
+
+    """
+    exitos = sum(1 for costo, _ in corridas if costo == 0)
+    tiempo_total = sum(tiempo for _, tiempo in corridas)
+    return {'parametros': parametros,
+            'repeticiones': len(corridas),
+            'exito': float(exitos) / len(corridas),
+            'costo': float(sum(costo for costo, _ in corridas)) / len(corridas),
+            'tiempo_por_solucion': tiempo_total / exitos if exitos else float('inf')}
+
+
+def _orden(fila):
+    return (fila['tiempo_por_solucion'], fila['costo'])
+
+
+def barrido(algoritmo, espacio, n=8, n_aleatorias=None, repeticiones=2, eta=3,
+            max_repeticiones=54, procesos=None):
+    """
+    Barrido de parámetros con poda por mitades sucesivas
+
+    @param algoritmo: Una de las llaves de PARAMETROS
+    @param espacio: Diccionario {parámetro: lista de valores}
+    @param n: Número de reinas
+    @param n_aleatorias: Número de configuraciones aleatorias (None para la malla completa)
+    @param repeticiones: Repeticiones por configuración en la primera ronda
+    @param eta: En cada ronda sobrevive 1 / eta de las configuraciones
+    @param max_repeticiones: Repeticiones máximas por configuración
+    @param procesos: Número de procesos (None para usar todos los procesadores)
+
+    @return: La tabla de resultados (lista de diccionarios, ver resumen) ordenada
+             de mejor a peor. Las configuraciones podadas quedan al final con
+             las repeticiones que alcanzaron.
+
+    """
+    candidatas = configuraciones(espacio, n_aleatorias)
+    corridas = [[] for _ in candidatas]
+    vivas = range(len(candidatas))
+    podadas = []
+
+    pool = Pool(procesos)
+    try:
+        while True:
+            tareas, duenos = [], []
+            for k in vivas:
+                for semilla in xrange(len(corridas[k]), repeticiones):
+                    tareas.append((algoritmo, candidatas[k], n, semilla))
+                    duenos.append(k)
+            for k, resultado in zip(duenos, pool.map(_corre, tareas)):
+                corridas[k].append(resultado)
+
+            filas = sorted(((resumen(candidatas[k], corridas[k]), k) for k in vivas),
+                           key=lambda fila_k: _orden(fila_k[0]))
+            if len(vivas) == 1 or repeticiones >= max_repeticiones:
+                break
+            sobreviven = max(1, len(vivas) // eta)
+            podadas = [fila for fila, _ in filas[sobreviven:]] + podadas
+            vivas = [k for _, k in filas[:sobreviven]]
+            repeticiones = min(repeticiones * eta, max_repeticiones)
+    finally:
+        pool.terminate()
+
+    return [fila for fila, _ in filas] + podadas
+
+
+def imprime_tabla(tabla):
+    """ Imprime la tabla de resultados de un barrido """
+
+    print "\n" + "lugar".center(6) + "parametros".center(60) + "rep".center(6) + \
+        "exito".center(8) + "costo".center(8) + "tiempo/sol".center(12)
+    for lugar, fila in enumerate(tabla):
+        print str(lugar + 1).center(6) + str(fila['parametros']).center(60) + \
+            str(fila['repeticiones']).center(6) + ("%.2f" % fila['exito']).center(8) + \
+            ("%.2f" % fila['costo']).center(8) + ("%.4f" % fila['tiempo_por_solucion']).center(12)
+
+
+if __name__ == "__main__":
+
+    imprime_tabla(barrido('genetico1', {'prob_muta': [0.001, 0.01, 0.05],
+                                        'n_poblacion': [50, 100, 200],
+                                        'n_generaciones': [10, 30]}, n=8))
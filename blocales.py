@@ -13,6 +13,7 @@ __author__ = 'juliowaissman'
 
 from math import exp
 from random import random
+from random import sample
 
 
 class Problema(object):
@@ -26,6 +27,10 @@ class Problema(object):
 
     c) temple_simulado requiere vecino_aleatorio
 
+    d) busqueda_tabu utiliza intercambios y costo_intercambio si están
+       implementados, y en otro caso vecinos (o vecino_aleatorio con lista
+       de candidatos muestreada)
+
     """
     def estado_aleatorio(self):
         """
@@ -34,6 +39,17 @@ class Problema(object):
         """
         raise NotImplementedError("¡Este metodo debe ser implementado por la subclase!")
 
+    def estado_constructivo(self):
+        """
+        Genera un estado con alguna heurística constructiva barata (por ejemplo
+        golosa y aleatorizada) para sembrar poblaciones iniciales. Por default
+        es un estado aleatorio.
+
+        @return Una tupla que describe un estado
+
+        """
+        return self.estado_aleatorio()
+
     def vecinos(self, estado):
         """
         Generador de los vecinos de un estado
@@ -56,6 +72,51 @@ class Problema(object):
         """
         raise NotImplementedError("¡Este metodo debe ser implementado por la subclase!")
 
+    def intercambios(self, estado):
+        """
+        Generador de los pares de posiciones (i, j) que, al intercambiarse,
+        producen un estado vecino. Sólo tiene sentido para problemas cuyos
+        estados son permutaciones.
+
+        @param estado: Una tupla que describe un estado
+
+        @return: Un generador de tuplas (i, j) con i < j
+
+        """
+        raise NotImplementedError("¡Este metodo debe ser implementado por la subclase!")
+
+    def costo_intercambio(self, estado, i, j):
+        """
+        Calcula la diferencia de costo al intercambiar las posiciones i y j de
+        un estado. Por default calcula el costo completo de ambos estados, las
+        subclases deben de sobrecargarlo con un cálculo incremental.
+
+        @param estado: Una tupla que describe un estado
+        @param i: Primera posición a intercambiar
+        @param j: Segunda posición a intercambiar
+
+        @return: costo(vecino) - costo(estado)
+
+        """
+        return self.costo(self.aplica_intercambio(estado, i, j)) - self.costo(estado)
+
+    def aplica_intercambio(self, estado, i, j):
+        """
+        Intercambia las posiciones i y j de un estado. Las subclases que guardan
+        información del último estado consultado (para costo_intercambio) pueden
+        sobrecargarlo para actualizarla en lugar de recalcularla.
+
+        @param estado: Una tupla que describe un estado
+        @param i: Primera posición a intercambiar
+        @param j: Segunda posición a intercambiar
+
+        @return: Una tupla con el nuevo estado
+
+        """
+        vecino = list(estado)
+        vecino[i], vecino[j] = vecino[j], vecino[i]
+        return tuple(vecino)
+
     def costo(self, estado):
         """
         Calcula el costo de un estado dado
@@ -68,12 +129,15 @@ class Problema(object):
         raise NotImplementedError("¡Este metodo debe ser implementado por la subclase!")
 
 
-def descenso_colinas(problema, maxit=1000000):
+def descenso_colinas(problema, maxit=1000000, progreso=None):
     """
     Busqueda local por descenso de colinas.
 
     @param problema: Un objeto de una clase heredada de blocales.Problema
     @param maxit: Máximo número de iteraciones
+    @param progreso: Si no es None, una función que se llama en cada iteración como
+                     progreso(iteracion, costo). Puede lanzar una excepción para
+                     interrumpir la búsqueda.
 
     @return: El estado con el menor costo encontrado
 
@@ -81,7 +145,9 @@ def descenso_colinas(problema, maxit=1000000):
     estado = problema.estado_aleatorio()
     costo = problema.costo(estado)
 
-    for _ in xrange(maxit):
+    for i in xrange(maxit):
+        if progreso is not None:
+            progreso(i, costo)
         e = min(problema.vecinos(estado), key=problema.costo)
         c = problema.costo(e)
         if c >= costo:
@@ -90,13 +156,17 @@ def descenso_colinas(problema, maxit=1000000):
     return estado
 
 
-def temple_simulado(problema, calendarizador=lambda i: cal_expon(i, 100, 0.01), maxit=1000000):
+def temple_simulado(problema, calendarizador=lambda i: cal_expon(i, 100, 0.01), maxit=1000000,
+                    progreso=None):
     """
     Busqueda local por temple simulado
 
     @param problema: Un objeto de una clase heredada de blocales.Problema
     @param calendarizador: Una función que recibe la iteración y devuelve la temperatura
     @param maxit: Máximo número de iteraciones
+    @param progreso: Si no es None, una función que se llama en cada iteración como
+                     progreso(iteracion, temperatura, costo, mejor costo). Puede
+                     lanzar una excepción para interrumpir la búsqueda.
 
     @return: El estado con el menor costo encontrado
 
@@ -122,10 +192,137 @@ def temple_simulado(problema, calendarizador=lambda i: cal_expon(i, 100, 0.01),
             if c_mejor - costo > 0:
                 e_mejor, c_mejor = estado, costo
 
+        if progreso is not None:
+            progreso(i, temperatura, costo, c_mejor)
+
     return e_mejor
     #return estado
 
 
+class ListaTabu(object):
+    """
+    Lista tabú de tamaño fijo. Los movimientos se guardan en un buffer
+    circular y en un diccionario de ocurrencias, por lo que tanto agregar
+    como consultar si un movimiento es tabú son operaciones O(1).
+
+    """
+    def __init__(self, tenencia):
+        self.tenencia = tenencia
+        self.buffer = [None] * tenencia
+        self.indice = 0
+        self.ocurrencias = {}
+
+    def __contains__(self, movimiento):
+        return movimiento in self.ocurrencias
+
+    def agrega(self, movimiento):
+        """
+        Agrega un movimiento, desplazando al más antiguo si la lista está llena
+
+        @param movimiento: Un objeto hasheable que describe el movimiento
+
+        """
+        if self.tenencia <= 0:
+            return
+        viejo = self.buffer[self.indice]
+        if viejo is not None:
+            self.ocurrencias[viejo] -= 1
+            if self.ocurrencias[viejo] == 0:
+                del self.ocurrencias[viejo]
+        self.buffer[self.indice] = movimiento
+        self.ocurrencias[movimiento] = self.ocurrencias.get(movimiento, 0) + 1
+        self.indice = (self.indice + 1) % self.tenencia
+
+
+def _soporta_intercambios(problema, estado):
+    """ Revisa si el problema implementa el vecindario por intercambios """
+    try:
+        next(iter(problema.intercambios(estado)), None)
+    except NotImplementedError:
+        return False
+    return True
+
+
+def busqueda_tabu(problema, maxit=10000, tenencia=10, n_candidatos=None, costo_minimo=None,
+                  progreso=None):
+    """
+    Busqueda tabú.
+
+    Si el problema implementa intercambios, los movimientos son pares de
+    posiciones (i, j) y se evalúan con costo_intercambio (costo incremental);
+    la lista tabú guarda los pares intercambiados. En otro caso se utilizan
+    los estados completos generados por vecinos y la lista tabú guarda los
+    estados visitados.
+
+    Un movimiento tabú se acepta si mejora al mejor estado encontrado
+    (criterio de aspiración).
+
+    @param problema: Un objeto de una clase heredada de blocales.Problema
+    @param maxit: Máximo número de iteraciones
+    @param tenencia: Número de iteraciones que un movimiento permanece tabú
+    @param n_candidatos: Si no es None, en cada iteración sólo se revisa una
+                         muestra aleatoria de n_candidatos vecinos
+    @param costo_minimo: Si no es None, la búsqueda termina al alcanzar este costo
+    @param progreso: Si no es None, una función que se llama en cada iteración como
+                     progreso(iteracion, costo, mejor costo). Puede lanzar una
+                     excepción para interrumpir la búsqueda.
+
+    @return: El estado con el menor costo encontrado
+
+    """
+    estado = problema.estado_aleatorio()
+    costo = problema.costo(estado)
+    e_mejor, c_mejor = estado, costo
+
+    tabu = ListaTabu(tenencia)
+    por_intercambios = _soporta_intercambios(problema, estado)
+    n = len(estado)
+
+    for it in xrange(maxit):
+        if costo_minimo is not None and c_mejor <= costo_minimo:
+            break
+        if progreso is not None:
+            progreso(it, costo, c_mejor)
+
+        if por_intercambios:
+            if n_candidatos is None:
+                candidatos = problema.intercambios(estado)
+            else:
+                candidatos = (tuple(sorted(sample(xrange(n), 2))) for _ in xrange(n_candidatos))
+        else:
+            if n_candidatos is None:
+                candidatos = problema.vecinos(estado)
+            else:
+                candidatos = (problema.vecino_aleatorio(estado) for _ in xrange(n_candidatos))
+
+        movimiento, c_movimiento = None, None
+        for candidato in candidatos:
+            if por_intercambios:
+                c = costo + problema.costo_intercambio(estado, candidato[0], candidato[1])
+            else:
+                c = problema.costo(candidato)
+            if candidato in tabu and c >= c_mejor:
+                continue
+            if c_movimiento is None or c < c_movimiento:
+                movimiento, c_movimiento = candidato, c
+
+        if movimiento is None:
+            break
+
+        if por_intercambios:
+            tabu.agrega(movimiento)
+            estado = problema.aplica_intercambio(estado, movimiento[0], movimiento[1])
+        else:
+            tabu.agrega(estado)
+            estado = movimiento
+        costo = c_movimiento
+
+        if costo < c_mejor:
+            e_mejor, c_mejor = estado, costo
+
+    return e_mejor
+
+
 def cal_expon(iteracion, K=100, delta=0.01):
     """
     Calendarizador exponencial
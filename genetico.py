@@ -21,10 +21,25 @@ y nreinas.py vistas en clase.
 
 __author__ = 'Cruz Luque Juan Manuel'
 
+import blocales
 import nreinas
 import random
+from almacen import llave as llave_corrida
 import time
+from itertools import chain
 from itertools import combinations
+from math import log
+
+
+def _intercambio_incremental(problema):
+    """
+    @return: True si el problema sobrecarga costo_intercambio; la versión de
+             blocales.Problema calcula dos costos completos por intercambio y
+             conviene más mutar y evaluar una sola vez
+
+    """
+    return problema.__class__.costo_intercambio.__func__ is not \
+        blocales.Problema.costo_intercambio.__func__
 
 
 """
@@ -44,36 +59,200 @@ class Genetico:
     @param n_poblacion: Entero con el tamaño de la población
     @param n_generaciones: Número de generaciones a simular
     @param elitismo: Booleano, para aplicar o no el elitismo
+    @param elimina_duplicados: Booleano, para sustituir los individuos repetidos por
+                               estados aleatorios en cada generación
+    @param mide_diversidad: Booleano, para guardar en self.diversidad una tupla
+                            (distancia de Hamming promedio, entropía por posición)
+                            por generación
+    @param prop_constructiva: Proporción de la población inicial generada con
+                              problema.estado_constructivo (el resto es aleatoria)
+    @param progreso: Si no es None, una función que se llama al inicio de cada generación
+                     como progreso(generacion, mejor costo de la población). Puede lanzar
+                     una excepción para interrumpir la búsqueda.
+    @param sustituto: Si no es None, un modelo barato del costo (como SustitutoLineal) con
+                      el que se ordenan los hijos antes de evaluarlos (ver
+                      preselecciona). La precisión del modelo por generación se guarda
+                      en self.precision_sustituto.
+    @param prop_evaluada: Fracción de los hijos que se evalúan con el costo real cuando
+                          se usa un sustituto
 
     @return: Un estado del problema
 
     """
 
-    def busqueda(self, problema, n_poblacion=10, n_generaciones=30, elitismo=True):
+    operador_cruza = None
+
+    def busqueda(self, problema, n_poblacion=10, n_generaciones=30, elitismo=True,
+                 elimina_duplicados=False, mide_diversidad=False, prop_constructiva=0.0,
+                 progreso=None, sustituto=None, prop_evaluada=0.5):
+
+        poblacion = self.poblacion_inicial(problema, n_poblacion, prop_constructiva)
+
+        self.diversidad = []
 
-        poblacion = [problema.estado_aleatorio() for _ in range(n_poblacion)]
+        self.precision_sustituto = []
 
-        for _ in range(n_generaciones):
+        # Costos ya conocidos de los individuos de la generación actual (los devuelve
+        # mutacion_con_costo), para no volver a evaluarlos.
+        costos = {}
 
-            aptitud = [self.calcula_aptitud(individuo, problema.costo) for individuo in poblacion]
+        def costo(individuo):
+            if individuo not in costos:
+                costos[individuo] = problema.costo(individuo)
+            return costos[individuo]
 
-            elite = min(poblacion, key = problema.costo) if elitismo else None
+        for generacion in range(n_generaciones):
+
+            if elimina_duplicados:
+                poblacion = self.quita_duplicados(poblacion, problema)
+
+            if mide_diversidad:
+                self.diversidad.append((hamming_promedio(poblacion), entropia_posicional(poblacion)))
+
+            aptitud = [self.calcula_aptitud(individuo, costo) for individuo in poblacion]
+
+            elite = min(poblacion, key = costo) if elitismo else None
+
+            if progreso is not None:
+                progreso(generacion, costo(elite) if elitismo else min(map(costo, poblacion)))
 
             padres, madres = self.seleccion(poblacion, aptitud)
 
-            poblacion = self.mutacion(self.cruza_listas(padres, madres))
+            if sustituto is None:
+
+                evaluados = self.mutacion_con_costo(self.cruza_listas(padres, madres), problema)
+
+                evaluados = evaluados[:n_poblacion]
+
+            else:
 
-            poblacion = poblacion[:n_poblacion]
+                if generacion == 0:
+                    sustituto.ajusta(poblacion, [costo(individuo) for individuo in poblacion])
+
+                hijos = self.mutacion(self.cruza_listas(padres, madres))[:n_poblacion]
+
+                evaluados = self.preselecciona(hijos, [(e, costo(e)) for e in poblacion],
+                                               problema, sustituto, prop_evaluada)
+
+            poblacion = [individuo for (individuo, _) in evaluados]
 
             if elitismo:
+                evaluados.append((elite, costo(elite)))
                 poblacion.append(elite)
 
-        e = min(poblacion, key = problema.costo)
+            costos.clear()
+
+            costos.update(evaluados)
+
+        e = min(poblacion, key = costo)
 
         return e
 
     """
 
+    Preselección de hijos con un modelo sustituto. Los hijos se ordenan por el costo que
+    predice el sustituto y sólo la fracción prop_evaluada de los mejores se evalúa con
+    problema.costo; el resto de la generación se completa con los mejores individuos de la
+    generación anterior. Con los hijos evaluados se reentrena el sustituto y se guarda en
+    self.precision_sustituto una tupla (error absoluto medio, correlación de rangos entre
+    predicción y costo real).
+
+    @param hijos: Una lista de individuos sin evaluar
+    @param anteriores: Una lista de tuplas (individuo, costo) de la generación anterior
+    @param problema: Un objeto de la clase blocal.problema
+    @param sustituto: Un objeto con los métodos predice(individuo) y
+                      ajusta(individuos, costos)
+    @param prop_evaluada: Fracción de los hijos que se evalúa
+
+    @return: Una lista de tuplas (individuo, costo) del tamaño de hijos
+
+    """
+
+    def preselecciona(self, hijos, anteriores, problema, sustituto, prop_evaluada):
+
+        predicciones = [sustituto.predice(hijo) for hijo in hijos]
+
+        orden = sorted(range(len(hijos)), key = predicciones.__getitem__)
+
+        n_evaluados = max(1, int(round(prop_evaluada * len(hijos))))
+
+        escogidos = [hijos[k] for k in orden[:n_evaluados]]
+
+        reales = [problema.costo(hijo) for hijo in escogidos]
+
+        predichos = [predicciones[k] for k in orden[:n_evaluados]]
+
+        self.precision_sustituto.append(
+            (sum(abs(p - r) for (p, r) in zip(predichos, reales)) / float(n_evaluados),
+             correlacion_rangos(predichos, reales)))
+
+        sustituto.ajusta(escogidos, reales)
+
+        anteriores = sorted(anteriores, key = lambda par: par[1])
+
+        return zip(escogidos, reales) + anteriores[:len(hijos) - n_evaluados]
+
+    """
+
+    Genera la población inicial. Una proporción de los individuos se construye con la
+    heurística del problema (problema.estado_constructivo) y el resto son estados
+    aleatorios, para no perder diversidad.
+
+    @param problema: Un objeto de la clase blocal.problema
+    @param n_poblacion: Entero con el tamaño de la población
+    @param prop_constructiva: Flotante entre 0 y 1
+
+    @return: Una lista de individuos
+
+    """
+
+    def poblacion_inicial(self, problema, n_poblacion, prop_constructiva=0.0):
+
+        n_constructivos = int(round(prop_constructiva * n_poblacion))
+
+        poblacion = [problema.estado_constructivo() for _ in range(n_constructivos)]
+
+        poblacion.extend(problema.estado_aleatorio() for _ in range(n_poblacion - n_constructivos))
+
+        return poblacion
+
+    """
+
+    Sustituye los individuos repetidos de una población por estados aleatorios, conservando
+    la primera aparición de cada uno. Utiliza un conjunto para que la revisión sea O(1)
+    por individuo.
+
+    @param poblacion: Una lista de individuos (tuplas)
+    @param problema: Un objeto de la clase blocal.problema
+
+    @return: Una lista de individuos sin repetidos (en lo posible)
+
+    """
+
+    def quita_duplicados(self, poblacion, problema, max_intentos=10):
+
+        vistos = set()
+
+        nueva = []
+
+        for individuo in poblacion:
+
+            intentos = 0
+
+            while individuo in vistos and intentos < max_intentos:
+
+                individuo = problema.estado_aleatorio()
+
+                intentos += 1
+
+            vistos.add(individuo)
+
+            nueva.append(individuo)
+
+        return nueva
+
+    """
+
     Calcula la adaptación de un individuo al medio, mientras más adaptado mejor, por default
     es inversamente proporcionl al costo (mayor costo, menor adaptción).
 
@@ -111,7 +290,10 @@ class Genetico:
 
     """
 
-    Cruza una lista de padres con una lista de madres, cada pareja da dos hijos.
+    Cruza una lista de padres con una lista de madres, cada pareja da dos hijos. Si se
+    definió self.operador_cruza (una función que recibe padres y madres, como
+    cruza_ox_listas) se utiliza éste en lugar de self.cruza. Las subclases pueden
+    sobrecargar este método para cruzar toda la generación en una sola llamada.
 
     @param padres: Una lista de individuos
     @param madres: Una lista de individuos
@@ -122,6 +304,9 @@ class Genetico:
 
     def cruza_listas(self, padres, madres):
 
+        if self.operador_cruza is not None:
+            return self.operador_cruza(padres, madres)
+
         hijos = []
 
         for (padre, madre) in zip(padres, madres):
@@ -159,6 +344,23 @@ class Genetico:
 
         raise NotImplementedError("¡Este metodo debe ser implementado por la subclase!")
 
+    """
+
+    Mutación de una población devolviendo también el costo de cada individuo mutado. Por
+    default muta con self.mutacion y evalúa cada individuo completo; las subclases pueden
+    sobrecargarlo para actualizar el costo con problema.costo_intercambio en cada cambio.
+
+    @param poblacion: Una lista de individuos
+    @param problema: Un objeto de la clase blocal.problema
+
+    @return: Una lista de tuplas (individuo mutado, costo)
+
+    """
+
+    def mutacion_con_costo(self, poblacion, problema):
+
+        return [(individuo, problema.costo(individuo)) for individuo in self.mutacion(poblacion)]
+
 
 """
 
@@ -171,15 +373,25 @@ class GeneticoPermutaciones1(Genetico):
     """
 
     @param prob_muta : Probabilidad de mutación de un cromosoma (0.01 por defualt)
+    @param operador_cruza : Función de cruza por listas (None para usar cruza_pmx_listas,
+                            que produce los mismos hijos que self.cruza, o self.cruza
+                            si una subclase la sobrecarga)
 
     """
 
-    def __init__(self, prob_muta = 0.01):
+    def __init__(self, prob_muta = 0.01, operador_cruza = None):
 
         self.prob_muta = prob_muta
 
         self.nombre = 'propuesto por el profesor con prob. de mutación ' + str(prob_muta)
 
+        self.operador_cruza = operador_cruza
+
+        if operador_cruza is not None:
+            self.nombre += ' y cruza ' + operador_cruza.__name__
+        elif self.__class__.cruza.__func__ is GeneticoPermutaciones1.cruza.__func__:
+            self.operador_cruza = cruza_pmx_listas
+
     """
 
     Selección por torneo.
@@ -283,6 +495,47 @@ class GeneticoPermutaciones1(Genetico):
 
         return poblacion_mutada
 
+    """
+
+    La misma mutación que self.mutacion, pero devolviendo el costo de cada individuo. El
+    costo se calcula una vez antes de mutar y se actualiza en O(1) por cada intercambio
+    con problema.costo_intercambio (si el problema no lo sobrecarga, se muta y se evalúa
+    una vez al final como en Genetico.mutacion_con_costo).
+
+    @param poblacion: Una lista de individuos (tuplas)
+    @param problema: Un objeto de la clase blocal.problema
+
+    @return: Una lista de tuplas (individuo mutado, costo)
+
+    """
+
+    def mutacion_con_costo(self, poblacion, problema):
+
+        if not _intercambio_incremental(problema):
+            return Genetico.mutacion_con_costo(self, poblacion, problema)
+
+        evaluados = []
+
+        for individuo in poblacion:
+
+            costo = problema.costo(individuo)
+
+            for i in range(len(individuo)):
+
+                if random.random() < self.prob_muta:
+
+                    k = random.randint(0, len(individuo) - 1)
+
+                    if k != i:
+
+                        costo += problema.costo_intercambio(individuo, i, k)
+
+                        individuo = problema.aplica_intercambio(individuo, i, k)
+
+            evaluados.append((individuo, costo))
+
+        return evaluados
+
 
 ################################################################################################
 #  AQUI EMPIEZA LO QUE HAY QUE HACER CON LA TAREA
@@ -302,7 +555,7 @@ class GeneticoPermutaciones2(Genetico):
 
     """
 
-    def __init__(self, prob_muta = 0.01):
+    def __init__(self, prob_muta = 0.01, operador_cruza = None):
 
         #
         # ------ IMPLEMENTA AQUI TU CÓDIGO ------------------------------------------------------------------------
@@ -312,6 +565,11 @@ class GeneticoPermutaciones2(Genetico):
 
         self.nombre = 'propuesto por el alumno con prob. de mutación ' + str(prob_muta)
 
+        self.operador_cruza = operador_cruza
+
+        if operador_cruza is not None:
+            self.nombre += ' y cruza ' + operador_cruza.__name__
+
     """
 
     Desarrolla un método específico de medición de aptitud.
@@ -547,25 +805,917 @@ class GeneticoPermutaciones2(Genetico):
 
         return poblacion_mutada
 
-def prueba_genetico_nreinas(algo_genetico, problema, n_poblacion, n_generaciones):
+    """
+
+    La misma mutación (switch) que self.mutacion, pero devolviendo el costo de cada
+    individuo, actualizado en cada intercambio con problema.costo_intercambio (si el
+    problema lo sobrecarga; si no, se muta y se evalúa una vez al final).
 
-    tiempo_inicial = time.time()
+    @param poblacion: Una lista de individuos (tuplas)
+    @param problema: Un objeto de la clase blocal.problema
 
-    solucion = algo_genetico.busqueda(problema, n_poblacion, n_generaciones, elitismo = True)
+    @return: Una lista de tuplas (individuo mutado, costo)
 
-    tiempo_final = time.time()
+    """
 
-    print "\nUtilizando el algoritmo genético " + algo_genetico.nombre
+    def mutacion_con_costo(self, poblacion, problema):
 
-    print "Con poblacion de dimensión ", n_poblacion
+        if not _intercambio_incremental(problema):
+            return Genetico.mutacion_con_costo(self, poblacion, problema)
 
-    print "Con ", str(n_generaciones), " generaciones"
+        evaluados = []
+
+        for individuo in poblacion:
+
+            costo = problema.costo(individuo)
+
+            for i in range(len(individuo)):
+
+                if random.random() < self.prob_muta:
+
+                    k = random.randint(0, len(individuo) - 1)
+
+                    j = 0 if k == len(individuo) - 1 else k + 1
+
+                    if j != k:
+
+                        costo += problema.costo_intercambio(individuo, k, j)
+
+                        individuo = problema.aplica_intercambio(individuo, k, j)
+
+            evaluados.append((individuo, costo))
+
+        return evaluados
+
+"""
+
+Algoritmo genético celular: los individuos viven en una malla toroidal y cada uno sólo
+se cruza con individuos de su vecindario, lo que retrasa la convergencia prematura.
+
+"""
+
+class GeneticoCelular(GeneticoPermutaciones1):
+
+    """
+
+    Utiliza la cruza y la mutación de GeneticoPermutaciones1. La actualización es
+    síncrona: en cada generación todas las celdas escogen pareja al mismo tiempo (torneo
+    binario en su vecindario), se cruzan todas las parejas en una sola llamada a
+    cruza_listas y se mutan todos los hijos con mutacion_con_costo. El primer hijo de
+    cada pareja compite por la celda que escogió pareja y el segundo por la celda de la
+    pareja; cada celda se reemplaza por el mejor de sus hijos si éste no es peor. Los
+    vecindarios se calculan una sola vez como una tabla de índices.
+
+    @param prob_muta : Probabilidad de mutación de un cromosoma (0.01 por defualt)
+    @param vecindario : 'von_neumann' (4 vecinos) o 'moore' (8 vecinos)
+    @param columnas : Columnas de la malla (por default la raíz de n_poblacion)
+    @param operador_cruza : Función de cruza por listas (None para usar PMX)
+
+    """
+
+    def __init__(self, prob_muta = 0.01, vecindario = 'von_neumann', columnas = None,
+                 operador_cruza = None):
+
+        GeneticoPermutaciones1.__init__(self, prob_muta, operador_cruza)
+
+        if vecindario not in ('von_neumann', 'moore'):
+            raise ValueError("El vecindario debe ser 'von_neumann' o 'moore'")
+
+        self.vecindario = vecindario
+
+        self.columnas = columnas
+
+        self.nombre = 'celular (' + vecindario + ') ' + self.nombre
+
+    """
+
+    Tabla de vecinos de cada celda de una malla toroidal. En mallas de menos de 3 filas
+    o columnas los desplazamientos llegan a la misma celda por los dos lados, así que
+    se quitan los repetidos y la celda misma.
+
+    @param filas: Número de filas
+    @param columnas: Número de columnas
+
+    @return: Una lista con la lista de índices vecinos de cada celda
+
+    """
+
+    def tabla_vecinos(self, filas, columnas):
+
+        if self.vecindario == 'moore':
+            desplazamientos = [(df, dc) for df in (-1, 0, 1) for dc in (-1, 0, 1) if df or dc]
+        else:
+            desplazamientos = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+
+        tabla = []
+
+        for f in range(filas):
+            for c in range(columnas):
+                vecindad = []
+                for (df, dc) in desplazamientos:
+                    vecino = ((f + df) % filas) * columnas + (c + dc) % columnas
+                    if vecino != f * columnas + c and vecino not in vecindad:
+                        vecindad.append(vecino)
+                tabla.append(vecindad)
+
+        return tabla
+
+    """
+
+    Búsqueda con el algoritmo genético celular. La población se ajusta a filas * columnas
+    individuos (al menos 2). El elitismo es implícito, ya que una celda sólo se reemplaza
+    por un hijo que no sea peor.
+
+    @param problema: Un objeto de la clase blocal.problema
+    @param n_poblacion: Entero con el tamaño de la población
+    @param n_generaciones: Número de generaciones a simular
+    @param elitismo: Se ignora (el reemplazo siempre es elitista)
+    @param elimina_duplicados, mide_diversidad, prop_constructiva, progreso: Igual que en
+           Genetico.busqueda
+
+    @return: Un estado del problema
+
+    """
+
+    def busqueda(self, problema, n_poblacion=10, n_generaciones=30, elitismo=True,
+                 elimina_duplicados=False, mide_diversidad=False, prop_constructiva=0.0,
+                 progreso=None):
+
+        columnas = self.columnas or max(1, int(round(n_poblacion ** 0.5)))
+
+        filas = max(1, n_poblacion // columnas)
+
+        n_celdas = filas * columnas
+
+        if n_celdas < 2:
+            raise ValueError("La malla debe tener al menos dos celdas")
+
+        vecinos = self.tabla_vecinos(filas, columnas)
+
+        n_vecinos = len(vecinos[0])
+
+        poblacion = self.poblacion_inicial(problema, n_celdas, prop_constructiva)
+
+        costos = [problema.costo(individuo) for individuo in poblacion]
+
+        self.diversidad = []
+
+        for generacion in range(n_generaciones):
+
+            if elimina_duplicados:
+                nueva = self.quita_duplicados(poblacion, problema)
+                costos = [c if a is b else problema.costo(b)
+                          for (a, b, c) in zip(poblacion, nueva, costos)]
+                poblacion = nueva
+
+            if mide_diversidad:
+                self.diversidad.append((hamming_promedio(poblacion), entropia_posicional(poblacion)))
+
+            if progreso is not None:
+                progreso(generacion, min(costos))
+
+            # Torneo binario en el vecindario de todas las celdas a la vez
+            parejas = []
+
+            for vecindad in vecinos:
+                a = vecindad[int(random.random() * n_vecinos)]
+                b = vecindad[int(random.random() * n_vecinos)]
+                parejas.append(a if costos[a] <= costos[b] else b)
+
+            hijos = self.cruza_listas(poblacion, [poblacion[m] for m in parejas])
+
+            evaluados = self.mutacion_con_costo(hijos, problema)
+
+            # Hijos 2k y 2k + 1 para la celda k y para su pareja
+            celdas = [celda for k in range(n_celdas) for celda in (k, parejas[k])]
+
+            for celda, (hijo, costo) in zip(celdas, evaluados):
+                if costo <= costos[celda]:
+                    poblacion[celda], costos[celda] = hijo, costo
+
+        return poblacion[min(range(n_celdas), key = costos.__getitem__)]
+
+"""
+
+Algoritmo de estimación de distribución (EDA) para permutaciones, como alternativa a la
+cruza y la mutación.
+
+"""
+
+class EDAPermutaciones(Genetico):
+
+    """
+
+    En cada generación se toma la fracción élite de la población, se estima con ella una
+    matriz n x n de probabilidades y se muestrea una población nueva completa. El modelo
+    puede ser un histograma de nodos (probabilidad de cada valor en cada posición) o de
+    aristas (probabilidad de que un valor siga a otro). A los conteos se les suma un
+    suavizado para no perder valores que la élite no contiene.
+
+    Supone que los estados son permutaciones de 0, ..., n-1.
+
+    @param prop_elite : Fracción de la población con la que se estima el modelo
+    @param modelo : 'nodos' o 'aristas'
+    @param suavizado : Conteo que se suma a todas las entradas de la matriz
+
+    """
+
+    def __init__(self, prop_elite = 0.3, modelo = 'nodos', suavizado = 0.1):
+
+        if modelo not in ('nodos', 'aristas'):
+            raise ValueError("El modelo debe ser 'nodos' o 'aristas'")
+
+        self.prop_elite = prop_elite
+
+        self.modelo = modelo
+
+        self.suavizado = suavizado
+
+        self.nombre = 'EDA con histograma de ' + modelo + ' y élite ' + str(prop_elite)
+
+    """
+
+    Estima la matriz de conteos a partir de la élite.
+
+    @param elite: Una lista de individuos
+    @param n: Longitud de los individuos
+
+    @return: Una lista de n listas de n flotantes
+
+    """
+
+    def estima(self, elite, n):
+
+        matriz = [[self.suavizado] * n for _ in range(n)]
+
+        for individuo in elite:
+
+            if self.modelo == 'nodos':
+                for i, v in enumerate(individuo):
+                    matriz[i][v] += 1
+            else:
+                for i in range(n):
+                    matriz[individuo[i - 1]][individuo[i]] += 1
+
+        return matriz
+
+    """
+
+    Muestrea un individuo del modelo. Con el modelo de nodos se llenan las posiciones en
+    orden aleatorio usando el renglón de cada posición; con el de aristas se parte de un
+    valor al azar y cada valor siguiente se escoge con el renglón del anterior. En ambos
+    casos sólo se consideran los valores aún no usados.
+
+    @param matriz: La matriz que devuelve self.estima
+    @param n: Longitud de los individuos
+
+    @return: Un individuo (tupla)
+
+    """
+
+    def muestrea(self, matriz, n):
+
+        libres = range(n)
+
+        individuo = [None] * n
+
+        orden = range(n)
+
+        if self.modelo == 'nodos':
+            random.shuffle(orden)
+        else:
+            anterior = libres.pop(int(random.random() * n))
+            individuo[0] = anterior
+            orden = orden[1:]
+
+        for i in orden:
+
+            renglon = matriz[i] if self.modelo == 'nodos' else matriz[anterior]
+
+            r = random.random() * sum(renglon[v] for v in libres)
+
+            for k, v in enumerate(libres):
+                r -= renglon[v]
+                if r <= 0:
+                    break
+
+            libres[k] = libres[-1]
+            libres.pop()
+            individuo[i] = anterior = v
+
+        return tuple(individuo)
+
+    """
+
+    Búsqueda con el EDA, con la misma interfaz que Genetico.busqueda. Con elitismo la
+    élite pasa completa a la siguiente generación.
+
+    @param problema: Un objeto de la clase blocal.problema
+    @param n_poblacion: Entero con el tamaño de la población
+    @param n_generaciones: Número de generaciones a simular
+    @param elitismo: Booleano, para conservar la élite
+    @param elimina_duplicados, mide_diversidad, prop_constructiva, progreso: Igual que en
+           Genetico.busqueda
+
+    @return: Un estado del problema
+
+    """
+
+    def busqueda(self, problema, n_poblacion=10, n_generaciones=30, elitismo=True,
+                 elimina_duplicados=False, mide_diversidad=False, prop_constructiva=0.0,
+                 progreso=None):
+
+        poblacion = self.poblacion_inicial(problema, n_poblacion, prop_constructiva)
+
+        evaluados = [(individuo, problema.costo(individuo)) for individuo in poblacion]
+
+        n = len(poblacion[0])
+
+        n_elite = max(1, int(self.prop_elite * n_poblacion))
+
+        self.diversidad = []
+
+        for generacion in range(n_generaciones):
+
+            if elimina_duplicados:
+                poblacion = self.quita_duplicados([e for (e, _) in evaluados], problema)
+                conocidos = dict(evaluados)
+                evaluados = [(e, conocidos[e] if e in conocidos else problema.costo(e))
+                             for e in poblacion]
+
+            if mide_diversidad:
+                self.diversidad.append((hamming_promedio([e for (e, _) in evaluados]),
+                                        entropia_posicional([e for (e, _) in evaluados])))
+
+            evaluados.sort(key = lambda par: par[1])
+
+            if progreso is not None:
+                progreso(generacion, evaluados[0][1])
+
+            elite = evaluados[:n_elite]
+
+            matriz = self.estima([e for (e, _) in elite], n)
+
+            nuevos = [self.muestrea(matriz, n)
+                      for _ in range(n_poblacion - (len(elite) if elitismo else 0))]
+
+            evaluados = (elite if elitismo else []) + \
+                [(individuo, problema.costo(individuo)) for individuo in nuevos]
+
+        return min(evaluados, key = lambda par: par[1])[0]
+
+"""
+
+Operadores de cruza para permutaciones de los valores 0, ..., n-1.
+
+Cada operador tiene dos formas: cruza_xx(padre, madre), que devuelve una lista con dos
+hijos, y cruza_xx_listas(padres, madres), que cruza todas las parejas en una sola llamada
+reutilizando los arreglos auxiliares (posiciones y marcas de valores usados), de modo que
+cada pareja se cruza en tiempo O(n) sin pruebas de pertenencia en listas.
+
+GeneticoPermutaciones1 utiliza cruza_pmx_listas por default. Para usar otro operador en
+un algoritmo genético basta pasar la forma por listas como operador_cruza,
+por ejemplo GeneticoPermutaciones1(0.05, operador_cruza=cruza_ox_listas).
+
+"""
+
+def cruza_pmx_listas(padres, madres):
+
+    """
+
+    Cruza parcialmente mapeada (PMX), la misma que GeneticoPermutaciones1.cruza pero para
+    toda una generación en una sola llamada. Las posiciones de cada padre y las marcas de
+    los valores del segmento se guardan en arreglos que se reutilizan entre parejas (las
+    marcas se invalidan con un sello por pareja en lugar de limpiarse), por lo que cada
+    pareja cuesta O(n) en lugar de O(n^2).
+
+    @param padres: Una lista de individuos
+    @param madres: Una lista de individuos
+
+    @return: Una lista de hijos, dos por pareja
+
+    """
+
+    hijos = []
+
+    pos_padre, pos_madre = [], []
+
+    marca_padre, marca_madre = [], []
+
+    for sello, (padre, madre) in enumerate(zip(padres, madres)):
+
+        n = len(padre)
+
+        if len(pos_padre) < n:
+            pos_padre, pos_madre = [0] * n, [0] * n
+            marca_padre, marca_madre = [-1] * n, [-1] * n
+
+        corte1 = random.randint(0, n - 1)
+
+        corte2 = random.randint(corte1 + 1, n)
+
+        for i in xrange(n):
+            pos_padre[padre[i]] = i
+            pos_madre[madre[i]] = i
+
+        for i in xrange(corte1, corte2):
+            marca_padre[padre[i]] = sello
+            marca_madre[madre[i]] = sello
+
+        hijo1, hijo2 = list(padre), list(madre)
+
+        for i in chain(xrange(corte1), xrange(corte2, n)):
+
+            v = madre[i]
+
+            while marca_padre[v] == sello:
+                v = madre[pos_padre[v]]
+
+            hijo1[i] = v
+
+            v = padre[i]
+
+            while marca_madre[v] == sello:
+                v = padre[pos_madre[v]]
+
+            hijo2[i] = v
+
+        hijos.append(tuple(hijo1))
+
+        hijos.append(tuple(hijo2))
+
+    return hijos
+
+def cruza_pmx(padre, madre):
+
+    return cruza_pmx_listas([padre], [madre])
+
+def _hijo_ox(padre, madre, corte1, corte2, usado):
+
+    n = len(padre)
+
+    hijo = [None] * n
+
+    for i in xrange(n):
+        usado[i] = False
+
+    for i in xrange(corte1, corte2):
+        hijo[i] = padre[i]
+        usado[padre[i]] = True
+
+    k = corte2 % n
+
+    for i in xrange(corte2, corte2 + n):
+
+        valor = madre[i % n]
+
+        if not usado[valor]:
+            hijo[k] = valor
+            k = (k + 1) % n
+
+    return tuple(hijo)
+
+def cruza_ox_listas(padres, madres):
+
+    """
+
+    Cruza por orden (OX). Cada hijo hereda un segmento de uno de los padres y completa el
+    resto con los valores del otro, en el orden en que aparecen a partir del segundo corte.
+
+    @param padres: Una lista de individuos
+    @param madres: Una lista de individuos
+
+    @return: Una lista de hijos, dos por pareja
+
+    """
+
+    hijos = []
+
+    usado = []
+
+    for (padre, madre) in zip(padres, madres):
+
+        n = len(padre)
+
+        if len(usado) < n:
+            usado = [False] * n
+
+        corte1 = random.randint(0, n - 1)
+
+        corte2 = random.randint(corte1 + 1, n)
+
+        hijos.append(_hijo_ox(padre, madre, corte1, corte2, usado))
+
+        hijos.append(_hijo_ox(madre, padre, corte1, corte2, usado))
+
+    return hijos
+
+def cruza_ox(padre, madre):
+
+    return cruza_ox_listas([padre], [madre])
+
+def cruza_cx_listas(padres, madres):
+
+    """
+
+    Cruza por ciclos (CX). Las posiciones se dividen en los ciclos que forman los dos
+    padres; el primer hijo toma los ciclos pares del padre y los impares de la madre, y el
+    segundo hijo al revés. Cada valor conserva la posición que tenía en alguno de los padres.
+
+    @param padres: Una lista de individuos
+    @param madres: Una lista de individuos
+
+    @return: Una lista de hijos, dos por pareja
+
+    """
+
+    hijos = []
+
+    posicion = []
+
+    visitado = []
+
+    for (padre, madre) in zip(padres, madres):
+
+        n = len(padre)
+
+        if len(posicion) < n:
+            posicion = [0] * n
+            visitado = [False] * n
+
+        for i in xrange(n):
+            posicion[padre[i]] = i
+            visitado[i] = False
+
+        hijo1, hijo2 = list(padre), list(madre)
+
+        ciclo = 0
+
+        for inicio in xrange(n):
+
+            if visitado[inicio]:
+                continue
+
+            i = inicio
+
+            while not visitado[i]:
+
+                visitado[i] = True
+
+                if ciclo % 2 == 1:
+                    hijo1[i], hijo2[i] = madre[i], padre[i]
+
+                i = posicion[madre[i]]
+
+            ciclo += 1
+
+        hijos.append(tuple(hijo1))
+
+        hijos.append(tuple(hijo2))
+
+    return hijos
+
+def cruza_cx(padre, madre):
+
+    return cruza_cx_listas([padre], [madre])
+
+def _hijo_ar(inicio, adyacencia, n):
+
+    # Los valores pendientes se guardan en una lista con índice inverso para poder
+    # quitar uno o escoger uno al azar en O(1).
+    pendientes = range(n)
+
+    indice = range(n)
+
+    hijo = []
+
+    actual = inicio
+
+    while True:
+
+        hijo.append(actual)
+
+        k = indice[actual]
+        ultimo = pendientes[-1]
+        pendientes[k], indice[ultimo] = ultimo, k
+        pendientes.pop()
+
+        if not pendientes:
+            break
+
+        vecinos = adyacencia[actual]
+
+        for v in vecinos:
+            adyacencia[v].discard(actual)
+
+        if vecinos:
+            menor = min(len(adyacencia[v]) for v in vecinos)
+            actual = random.choice([v for v in vecinos if len(adyacencia[v]) == menor])
+        else:
+            actual = random.choice(pendientes)
+
+    return tuple(hijo)
+
+def _adyacencia(padre, madre):
+
+    n = len(padre)
+
+    adyacencia = [set() for _ in xrange(n)]
+
+    for individuo in (padre, madre):
+
+        for i in xrange(n):
+            a, b = individuo[i], individuo[(i + 1) % n]
+            adyacencia[a].add(b)
+            adyacencia[b].add(a)
+
+    return adyacencia
+
+def cruza_ar_listas(padres, madres):
+
+    """
+
+    Cruza por recombinación de aristas. Se construye la tabla de adyacencias de ambos padres
+    (vistos como ciclos) y el hijo se arma avanzando siempre al vecino con menos adyacencias
+    restantes, o a un valor pendiente al azar si el actual ya no tiene vecinos. El primer
+    hijo empieza por el primer valor del padre y el segundo por el de la madre.
+
+    @param padres: Una lista de individuos
+    @param madres: Una lista de individuos
+
+    @return: Una lista de hijos, dos por pareja
+
+    """
+
+    hijos = []
+
+    for (padre, madre) in zip(padres, madres):
+
+        n = len(padre)
+
+        hijos.append(_hijo_ar(padre[0], _adyacencia(padre, madre), n))
+
+        hijos.append(_hijo_ar(madre[0], _adyacencia(padre, madre), n))
+
+    return hijos
+
+def cruza_ar(padre, madre):
+
+    return cruza_ar_listas([padre], [madre])
+
+
+"""
+
+Modelo sustituto del costo para preseleccionar hijos (ver Genetico.preselecciona).
+
+"""
+
+class SustitutoLineal:
+
+    """
+
+    Modelo lineal sobre las características (posición, valor): el costo predicho de un
+    individuo es b + suma de w[i][individuo[i]]. Se entrena en línea con descenso de
+    gradiente estocástico sobre el error cuadrático, una pasada por cada lote de
+    individuos evaluados. Predecir y entrenar cuestan O(n) por individuo.
+
+    @param tasa: Tasa de aprendizaje (se divide entre el número de características activas)
+    @param pasadas: Número de pasadas de entrenamiento por lote
+
+    """
+
+    def __init__(self, tasa = 0.1, pasadas = 1):
+
+        self.tasa = tasa
+
+        self.pasadas = pasadas
+
+        self.w = None
+
+        self.b = 0.0
+
+    def predice(self, individuo):
+
+        if self.w is None:
+            return self.b
+
+        w = self.w
+
+        return self.b + sum(w[i][v] for i, v in enumerate(individuo))
+
+    def ajusta(self, individuos, costos):
+
+        if not individuos:
+            return
+
+        if self.w is None:
+            n = len(individuos[0])
+            self.w = [[0.0] * n for _ in range(n)]
+            self.b = float(sum(costos)) / len(costos)
+
+        w = self.w
+
+        paso = self.tasa / (len(individuos[0]) + 1)
+
+        for _ in range(self.pasadas):
+
+            for individuo, costo in zip(individuos, costos):
+
+                error = (costo - self.predice(individuo)) * paso
+
+                self.b += error
+
+                for i, v in enumerate(individuo):
+                    w[i][v] += error
+
+def correlacion_rangos(x, y):
+
+    """
+
+    Correlación de Spearman entre dos listas: correlación de Pearson entre los
+    rangos, donde a los valores empatados se les asigna el promedio de sus rangos.
+
+    @return: Un flotante entre -1 y 1 (0 si alguna lista es constante o tiene menos de
+             dos elementos)
+
+    """
+
+    n = len(x)
+
+    if n < 2:
+        return 0.0
+
+    def rangos(valores):
+        r = [0.0] * n
+        orden = sorted(range(n), key = valores.__getitem__)
+        inicio = 0
+        while inicio < n:
+            fin = inicio + 1
+            while fin < n and valores[orden[fin]] == valores[orden[inicio]]:
+                fin += 1
+            for k in orden[inicio:fin]:
+                r[k] = (inicio + fin - 1) / 2.0
+            inicio = fin
+        return r
+
+    if len(set(x)) == 1 or len(set(y)) == 1:
+        return 0.0
+
+    rx, ry = rangos(x), rangos(y)
+    media = (n - 1) / 2.0
+
+    covarianza = sum((a - media) * (b - media) for (a, b) in zip(rx, ry))
+    varianza_x = sum((a - media) ** 2 for a in rx)
+    varianza_y = sum((b - media) ** 2 for b in ry)
+
+    return covarianza / (varianza_x * varianza_y) ** 0.5
+
+"""
+
+Medidas de diversidad de una población. El muestreo usa su propio generador para no
+alterar la secuencia de random en corridas con semilla.
+
+"""
+
+_muestreo = random.Random(0)
+
+def hamming_promedio(poblacion, n_muestras=100):
+
+    """
+
+    Estima la distancia de Hamming promedio entre parejas de individuos a partir de una
+    muestra aleatoria de n_muestras parejas (exacta si hay menos parejas que muestras).
+
+    @param poblacion: Una lista de individuos (tuplas de la misma longitud)
+    @param n_muestras: Número de parejas a muestrear
+
+    @return: Un flotante con la distancia promedio
+
+    """
+
+    n = len(poblacion)
+
+    if n < 2:
+        return 0.0
+
+    if n * (n - 1) / 2 <= n_muestras:
+        parejas = combinations(range(n), 2)
+    else:
+        parejas = (_muestreo.sample(xrange(n), 2) for _ in xrange(n_muestras))
+
+    total, cuenta = 0, 0
+
+    for i, j in parejas:
+        total += sum(1 for a, b in zip(poblacion[i], poblacion[j]) if a != b)
+        cuenta += 1
+
+    return float(total) / cuenta
+
+def entropia_posicional(poblacion):
+
+    """
+
+    Calcula la entropía (en bits) de los valores en cada posición de los individuos y
+    devuelve su promedio. Es 0 si todos los individuos son iguales.
+
+    @param poblacion: Una lista de individuos (tuplas de la misma longitud)
+
+    @return: Un flotante con la entropía promedio por posición
+
+    """
+
+    if not poblacion:
+        return 0.0
+
+    n = float(len(poblacion))
+
+    entropias = []
+
+    for valores in zip(*poblacion):
+
+        cuentas = {}
+
+        for v in valores:
+            cuentas[v] = cuentas.get(v, 0) + 1
+
+        entropias.append(-sum(c / n * log(c / n, 2) for c in cuentas.itervalues()))
+
+    return sum(entropias) / len(entropias)
+
+
+"""
+
+Prueba un algoritmo genético. Si se da una semilla y un almacén de resultados
+(almacen.AlmacenResultados), primero se busca en el almacén una corrida idéntica y
+sólo se ejecuta el algoritmo si no existe.
+
+"""
+
+def prueba_genetico_nreinas(algo_genetico, problema, n_poblacion, n_generaciones,
+                            semilla=None, almacen=None):
+
+    usa_almacen = almacen is not None and semilla is not None
+
+    if usa_almacen:
+        llave = llave_corrida(algo_genetico, problema,
+                              {'n_poblacion': n_poblacion, 'n_generaciones': n_generaciones}, semilla)
+        guardado = almacen.busca(llave)
+
+    if usa_almacen and guardado is not None:
+
+        solucion, costo, tiempo = tuple(guardado[0]), guardado[1], guardado[2]
+
+    else:
+
+        if semilla is not None:
+            random.seed(semilla)
+
+        tiempo_inicial = time.time()
+
+        solucion = algo_genetico.busqueda(problema, n_poblacion, n_generaciones, elitismo = True)
+
+        tiempo_final = time.time()
+
+        costo, tiempo = problema.costo(solucion), tiempo_final - tiempo_inicial
+
+        if usa_almacen:
+            almacen.guarda(llave, [solucion, costo, tiempo])
+
+    print "\nUtilizando el algoritmo genético " + algo_genetico.nombre
+
+    print "Con poblacion de dimensión ", n_poblacion
+
+    print "Con ", str(n_generaciones), " generaciones"
+
+    print "Costo de la solución encontrada: ", costo
+
+    print "Tiempo de ejecución en segundos: ", tiempo
+
+    return solucion, costo, tiempo
+
+"""
+
+Repite prueba_genetico_nreinas con las semillas 0, 1, ..., repeticiones - 1 (como los
+ciclos de 100 intentos de abajo) y resume los resultados.
+
+@return: Una tupla (aptitud promedio, tiempo promedio, mejor corrida)
+
+"""
+
+def prueba_genetico_repetida(algo_genetico, problema, n_poblacion, n_generaciones,
+                             repeticiones=100, almacen=None):
+
+    corridas = [prueba_genetico_nreinas(algo_genetico, problema, n_poblacion, n_generaciones,
+                                        semilla, almacen)
+                for semilla in range(repeticiones)]
+
+    ma = sum(float(corrida[1]) for corrida in corridas) / repeticiones
 
-    print "Costo de la solución encontrada: ", problema.costo(solucion)
+    mt = sum(float(corrida[2]) for corrida in corridas) / repeticiones
 
-    print "Tiempo de ejecución en segundos: ", tiempo_final - tiempo_inicial
+    si = min(corridas, key = lambda corrida: corrida[1])
 
-    return solucion, problema.costo(solucion),tiempo_final - tiempo_inicial
+    return ma, mt, si
 
 
 if __name__ == "__main__":
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+lotes.py
+------------
+
+Ejecución por lotes de trabajos de n reinas descritos en JSONL.
+
+Cada línea de entrada es un trabajo, por ejemplo
+
+    {"algoritmo": "genetico1", "n": 16, "parametros": {"prob_muta": 0.05},
+     "semilla": 0, "repeticiones": 10}
+
+donde algoritmo es una de las llaves de barrido.PARAMETROS. Cada repetición r
+se corre con la semilla semilla + r (o sin semilla si no se da). Por cada
+corrida terminada se escribe una línea JSON con la solución, el costo, el
+tiempo y el número de evaluaciones de costo, en el orden en que terminan. Si
+una corrida falla se escribe {"id": ..., "error": ...} y el lote sigue; los
+trabajos mal formados se rechazan antes de empezar.
+
+Cada corrida se identifica con un hash de (algoritmo, n, parámetros, semilla,
+repetición); si el archivo de salida ya contiene una corrida, ésta se salta,
+así que un lote interrumpido se reanuda volviendo a correr el mismo comando.
+
+Uso:
+
+    python lotes.py trabajos.jsonl -o resultados.jsonl -p 4
+    cat trabajos.jsonl | python lotes.py - -o resultados.jsonl
+
+"""
+
+import argparse
+import barrido
+import hashlib
+import json
+import os
+import sys
+from multiprocessing import Pool
+
+
+def corridas(trabajo):
+    """
+    Expande un trabajo en sus corridas
+
+    @param trabajo: Diccionario con algoritmo, n y opcionalmente parametros,
+                    semilla y repeticiones
+
+    @return: Una lista de diccionarios, uno por corrida, con su llave 'id'
+
+    @raise ValueError: Si el trabajo no es válido
+
+    """
+    if not isinstance(trabajo, dict):
+        raise ValueError(u'el trabajo debe ser un objeto JSON')
+    if trabajo.get('algoritmo') not in barrido.PARAMETROS:
+        raise ValueError(u'algoritmo desconocido: %r' % trabajo.get('algoritmo'))
+    for campo, minimo in (('n', 1), ('repeticiones', 0)):
+        valor = trabajo.get(campo, 1)
+        if not isinstance(valor, (int, long)) or isinstance(valor, bool) or valor < minimo:
+            raise ValueError(u'%s debe ser un entero mayor o igual a %d' % (campo, minimo))
+    semilla = trabajo.get('semilla')
+    if semilla is not None and (not isinstance(semilla, (int, long)) or isinstance(semilla, bool)):
+        raise ValueError(u'semilla debe ser un entero')
+    if not isinstance(trabajo.get('parametros', {}), dict):
+        raise ValueError(u'parametros debe ser un objeto JSON')
+    lista = []
+    for r in xrange(trabajo.get('repeticiones', 1)):
+        corrida = {'algoritmo': trabajo['algoritmo'],
+                   'n': trabajo['n'],
+                   'parametros': trabajo.get('parametros', {}),
+                   'semilla': None if semilla is None else semilla + r,
+                   'repeticion': r}
+        corrida['id'] = hashlib.sha1(json.dumps(corrida, sort_keys=True)).hexdigest()
+        lista.append(corrida)
+    return lista
+
+
+def terminadas(ruta):
+    """
+    @return: El conjunto de ids de las corridas que ya están en el archivo de salida
+             (incluyendo las que fallaron)
+
+    """
+    ids = set()
+    if ruta is None or not os.path.exists(ruta):
+        return ids
+    with open(ruta) as f:
+        for linea in f:
+            try:
+                ids.add(json.loads(linea)['id'])
+            except (ValueError, KeyError):
+                # Línea incompleta de una corrida interrumpida
+                continue
+    return ids
+
+
+def repara(ruta):
+    """
+    Recorta el archivo de salida hasta su último salto de línea, para que los
+    resultados nuevos no se peguen a la línea incompleta de una corrida
+    interrumpida
+
+    """
+    if ruta is None or not os.path.exists(ruta):
+        return
+    with open(ruta, 'r+b') as f:
+        f.seek(0, os.SEEK_END)
+        fin = f.tell()
+        while fin > 0:
+            inicio = max(0, fin - 4096)
+            f.seek(inicio)
+            bloque = f.read(fin - inicio)
+            k = bloque.rfind('\n')
+            if k >= 0:
+                fin = inicio + k + 1
+                break
+            fin = inicio
+        f.truncate(fin)
+
+
+def ejecuta(corrida):
+    """
+    Ejecuta una corrida y devuelve el diccionario de resultado, o
+    {'id': ..., 'error': mensaje} si la corrida lanza una excepción
+
+    """
+    try:
+        estado, costo, tiempo, evaluaciones = barrido.corre(corrida['algoritmo'],
+                                                            corrida['parametros'],
+                                                            corrida['n'], corrida['semilla'])
+    except Exception as e:
+        return {'id': corrida['id'], 'error': '%s: %s' % (e.__class__.__name__, e)}
+    resultado = dict(corrida)
+    resultado.update({'solucion': estado, 'costo': costo, 'tiempo': tiempo,
+                      'evaluaciones': evaluaciones})
+    return resultado
+
+
+def lote(entrada, salida, procesos=None):
+    """
+    Ejecuta un lote de trabajos
+
+    @param entrada: Un archivo abierto con un trabajo JSON por línea
+    @param salida: Ruta del archivo de resultados (None para escribir en stdout)
+    @param procesos: Número de procesos (None para usar todos los procesadores)
+
+    @return: El número de corridas ejecutadas
+
+    @raise ValueError: Si alguna línea de entrada no es un trabajo válido (antes
+                       de ejecutar cualquier corrida)
+
+    """
+    hechas = terminadas(salida)
+    pendientes = []
+    for numero, linea in enumerate(entrada, 1):
+        if not linea.strip():
+            continue
+        try:
+            trabajo = json.loads(linea)
+            pendientes.extend(c for c in corridas(trabajo) if c['id'] not in hechas)
+        except ValueError as e:
+            raise ValueError(u'línea %d: %s' % (numero, e))
+
+    repara(salida)
+    destino = sys.stdout if salida is None else open(salida, 'a')
+    pool = Pool(procesos)
+    try:
+        for resultado in pool.imap_unordered(ejecuta, pendientes):
+            destino.write(json.dumps(resultado) + '\n')
+            destino.flush()
+    finally:
+        pool.terminate()
+        if destino is not sys.stdout:
+            destino.close()
+    return len(pendientes)
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description=u'Ejecuta un lote de trabajos de n reinas en JSONL')
+    parser.add_argument('entrada', help=u'archivo JSONL con los trabajos, o - para stdin')
+    parser.add_argument('-o', '--salida', default=None,
+                        help=u'archivo JSONL de resultados (se reanuda si ya existe)')
+    parser.add_argument('-p', '--procesos', type=int, default=None,
+                        help=u'número de procesos (todos los procesadores por default)')
+    args = parser.parse_args(argumentos)
+
+    try:
+        if args.entrada == '-':
+            lote(sys.stdin, args.salida, args.procesos)
+        else:
+            with open(args.entrada) as entrada:
+                lote(entrada, args.salida, args.procesos)
+    except ValueError as e:
+        parser.error(unicode(e).encode('utf-8'))
+
+
+if __name__ == "__main__":
+
+    main()
@@ -12,11 +12,20 @@ __author__ = 'juliowaissman'
 
 
 import blocales
+from random import random
 from random import shuffle
 from random import sample
 from itertools import permutations
 from itertools import combinations
+from itertools import islice
 from math import exp
+from multiprocessing import Pool
+from multiprocessing import cpu_count
+from array import array
+from collections import deque
+from struct import calcsize
+from struct import pack
+from struct import unpack
 
 
 class ProblemaNreinas(blocales.Problema):
@@ -30,12 +39,42 @@ class ProblemaNreinas(blocales.Problema):
     """
     def __init__(self, n=8):
         self.n = n
+        self._cache_diagonales = (None, None, None)
 
     def estado_aleatorio(self):
         estado = range(self.n)
         shuffle(estado)
         return tuple(estado)
 
+    def estado_constructivo(self):
+        """
+        Coloca las reinas fila por fila en una columna libre escogida al azar
+        entre las que no comparten diagonal con las reinas ya colocadas. Las
+        diagonales ocupadas se guardan como bits de un entero. Si no hay
+        columna sin conflicto se usa cualquier columna libre.
+
+        @return Una tupla que describe un estado
+
+        """
+        n = self.n
+        columnas = range(n)
+        shuffle(columnas)
+        diag, anti = 0, 0
+        estado = []
+        for fila in xrange(n):
+            k = 0
+            for i, columna in enumerate(columnas):
+                if not (diag >> (fila + columna)) & 1 and not (anti >> (fila - columna + n - 1)) & 1:
+                    k = i
+                    break
+            columna = columnas[k]
+            columnas[k] = columnas[-1]
+            columnas.pop()
+            diag |= 1 << (fila + columna)
+            anti |= 1 << (fila - columna + n - 1)
+            estado.append(columna)
+        return tuple(estado)
+
     def vecinos(self, estado):
         """
         Generador de los vecinos de un estado, permutando de dos en dos posiciones
@@ -64,6 +103,97 @@ class ProblemaNreinas(blocales.Problema):
         vecino[i], vecino[j] = vecino[j], vecino[i]
         return tuple(vecino)
 
+    def intercambios(self, estado):
+        """
+        Generador de los pares de posiciones que se pueden intercambiar
+
+        @param estado: Una tupla que describe un estado
+
+        @return: Un generador de tuplas (i, j) con i < j
+
+        """
+        return combinations(xrange(self.n), 2)
+
+    def diagonales(self, estado):
+        """
+        Cuenta cuántas reinas hay en cada diagonal. Se guarda el resultado del
+        último estado consultado, por lo que varias llamadas con el mismo
+        estado cuestan O(n) sólo la primera vez.
+
+        @param estado: Una tupla que describe un estado
+
+        @return: Dos listas de longitud 2n - 1, con las reinas en cada diagonal
+                 (fila + columna) y en cada antidiagonal (fila - columna + n - 1)
+
+        """
+        if self._cache_diagonales[0] is not estado:
+            diag = [0] * (2 * self.n - 1)
+            anti = [0] * (2 * self.n - 1)
+            for fila, columna in enumerate(estado):
+                diag[fila + columna] += 1
+                anti[fila - columna + self.n - 1] += 1
+            self._cache_diagonales = (estado, diag, anti)
+        return self._cache_diagonales[1], self._cache_diagonales[2]
+
+    def costo_intercambio(self, estado, i, j):
+        """
+        Calcula en O(1) (una vez conocidas las diagonales del estado) la
+        diferencia de costo al intercambiar las reinas de las filas i y j.
+        Los conflictos por columna no cambian con un intercambio.
+
+        @param estado: Una tupla que describe un estado
+        @param i: Primera fila a intercambiar
+        @param j: Segunda fila a intercambiar
+
+        @return: costo(vecino) - costo(estado)
+
+        """
+        if i == j:
+            return 0
+        diag, anti = self.diagonales(estado)
+        n1 = self.n - 1
+        a, b = estado[i], estado[j]
+        delta = 0
+        for fila, columna, signo in ((i, a, -1), (j, b, -1), (i, b, 1), (j, a, 1)):
+            d, t = fila + columna, fila - columna + n1
+            if signo < 0:
+                diag[d] -= 1
+                anti[t] -= 1
+                delta -= diag[d] + anti[t]
+            else:
+                delta += diag[d] + anti[t]
+                diag[d] += 1
+                anti[t] += 1
+        for fila, columna, signo in ((i, b, -1), (j, a, -1), (i, a, 1), (j, b, 1)):
+            diag[fila + columna] += signo
+            anti[fila - columna + n1] += signo
+        return delta
+
+    def aplica_intercambio(self, estado, i, j):
+        """
+        Intercambia las reinas de las filas i y j. Si las diagonales de estado
+        están guardadas, se actualizan en O(1) para el nuevo estado.
+
+        @param estado: Una tupla que describe un estado
+        @param i: Primera fila a intercambiar
+        @param j: Segunda fila a intercambiar
+
+        @return: Una tupla con el nuevo estado
+
+        """
+        vecino = list(estado)
+        vecino[i], vecino[j] = vecino[j], vecino[i]
+        vecino = tuple(vecino)
+        cache, diag, anti = self._cache_diagonales
+        if cache is estado and i != j:
+            n1 = self.n - 1
+            for fila, columna, signo in ((i, estado[i], -1), (j, estado[j], -1),
+                                         (i, estado[j], 1), (j, estado[i], 1)):
+                diag[fila + columna] += signo
+                anti[fila - columna + n1] += signo
+            self._cache_diagonales = (vecino, diag, anti)
+        return vecino
+
     def costo(self, estado):
         """
         Calcula el costo de un estado por el número de conflictos entre reinas
@@ -80,6 +210,371 @@ class ProblemaNreinas(blocales.Problema):
         return c
 
 
+def _prefijos(n, profundidad=2):
+    """
+    Divide el árbol de búsqueda por las columnas de las primeras filas.
+    Por simetría (reflexión vertical) en la primera fila sólo se consideran
+    las columnas de la mitad izquierda y la central; las de la izquierda se
+    marcan para contarse dos veces.
+
+    @param profundidad: Número de filas de cada prefijo
+
+    @return: Una lista de tuplas (prefijo, reflejar)
+
+    """
+    prefijos = []
+    for c0 in xrange((n + 1) // 2):
+        reflejar = c0 < n // 2
+        parciales = [(c0,)]
+        for _ in xrange(min(profundidad, n) - 1):
+            parciales = [prefijo + (c,) for prefijo in parciales for c in xrange(n)
+                         if all(c != q and abs(c - q) != len(prefijo) - i
+                                for i, q in enumerate(prefijo))]
+        prefijos.extend((prefijo, reflejar) for prefijo in parciales)
+    return prefijos
+
+
+def _mascaras(n, prefijo):
+    """ Columnas y diagonales ocupadas (como bits) después de colocar el prefijo """
+    columnas, diag, anti = 0, 0, 0
+    for columna in prefijo:
+        bit = 1 << columna
+        columnas |= bit
+        diag = (diag | bit) << 1
+        anti = (anti | bit) >> 1
+    return columnas, diag, anti
+
+
+def _cuenta_prefijo(args):
+    """ Número de soluciones que empiezan con el prefijo (por 2 si se refleja) """
+    n, prefijo, reflejar = args
+    todas = (1 << n) - 1
+
+    def cuenta(fila, columnas, diag, anti):
+        if fila == n:
+            return 1
+        total = 0
+        libres = todas & ~(columnas | diag | anti)
+        while libres:
+            bit = libres & -libres
+            libres ^= bit
+            total += cuenta(fila + 1, columnas | bit, (diag | bit) << 1, (anti | bit) >> 1)
+        return total
+
+    columnas, diag, anti = _mascaras(n, prefijo)
+    total = cuenta(len(prefijo), columnas, diag, anti)
+    return 2 * total if reflejar else total
+
+
+def _genera_prefijo(n, prefijo, reflejar):
+    """ Generador de las soluciones que empiezan con el prefijo (y sus reflejos) """
+    todas = (1 << n) - 1
+    estado = list(prefijo)
+
+    # Búsqueda en profundidad con una pila de (columnas libres restantes, máscaras)
+    columnas, diag, anti = _mascaras(n, prefijo)
+    pila = [(todas & ~(columnas | diag | anti), columnas, diag, anti)]
+    while pila:
+        libres, columnas, diag, anti = pila[-1]
+        if len(estado) == n:
+            yield tuple(estado)
+            if reflejar:
+                yield tuple(n - 1 - c for c in estado)
+            libres = 0
+        if not libres:
+            pila.pop()
+            if len(estado) > len(prefijo):
+                estado.pop()
+            continue
+        bit = libres & -libres
+        pila[-1] = (libres ^ bit, columnas, diag, anti)
+        estado.append(bit.bit_length() - 1)
+        columnas, diag, anti = columnas | bit, (diag | bit) << 1, (anti | bit) >> 1
+        pila.append((todas & ~(columnas | diag | anti), columnas, diag, anti))
+
+
+def _soluciones_prefijo(args):
+    """ Lista de soluciones que empiezan con el prefijo (para el pool de procesos) """
+    return list(_genera_prefijo(*args))
+
+
+def cuenta_soluciones(n, procesos=None):
+    """
+    Cuenta en forma exacta las soluciones de las n reinas por backtracking con
+    máscaras de bits, repartiendo los prefijos del árbol entre procesos.
+
+    @param n: Número de reinas
+    @param procesos: Número de procesos (None para usar todos los procesadores,
+                     1 para no usar procesos)
+
+    @return: Un entero con el número de soluciones
+
+    """
+    tareas = [(n, prefijo, reflejar) for prefijo, reflejar in _prefijos(n)]
+    if procesos == 1:
+        return sum(_cuenta_prefijo(tarea) for tarea in tareas)
+    pool = Pool(procesos)
+    try:
+        return sum(pool.imap_unordered(_cuenta_prefijo, tareas))
+    finally:
+        pool.terminate()
+
+
+def soluciones(n, procesos=1):
+    """
+    Generador perezoso de todas las soluciones de las n reinas, en el mismo
+    formato de tupla que utiliza ProblemaNreinas (estado[fila] = columna). Con
+    varios procesos cada proceso calcula la lista de soluciones de un prefijo
+    y se entregan en el mismo orden que con un solo proceso.
+
+    @param n: Número de reinas
+    @param procesos: Número de procesos (None para usar todos los procesadores)
+
+    @return: Un generador de tuplas
+
+    """
+    if procesos == 1:
+        for prefijo, reflejar in _prefijos(n):
+            for solucion in _genera_prefijo(n, prefijo, reflejar):
+                yield solucion
+        return
+    # Prefijos de tres filas para que cada lista sea chica, y a lo más
+    # 4 * procesos listas en curso para no acumular en memoria las que el
+    # consumidor todavía no pide
+    tareas = iter([(n, prefijo, reflejar) for prefijo, reflejar in _prefijos(n, 3)])
+    pool = Pool(procesos)
+    try:
+        en_curso = deque(pool.apply_async(_soluciones_prefijo, (tarea,))
+                         for tarea in islice(tareas, 4 * (procesos or cpu_count())))
+        while en_curso:
+            lote = en_curso.popleft().get()
+            for tarea in islice(tareas, 1):
+                en_curso.append(pool.apply_async(_soluciones_prefijo, (tarea,)))
+            for solucion in lote:
+                yield solucion
+    finally:
+        pool.terminate()
+
+
+def forma_canonica(estado):
+    """
+    Forma canónica de un tablero bajo las 8 simetrías del cuadrado (rotaciones
+    y reflexiones). Para una permutación, trasponer el tablero es tomar la
+    permutación inversa, y las demás simetrías se obtienen invirtiendo el orden
+    de las filas y/o de las columnas, así que el cálculo es O(n).
+
+    @param estado: Una tupla que describe un estado (una permutación)
+
+    @return: La menor (lexicográficamente) de las 8 tuplas equivalentes
+
+    """
+    n = len(estado)
+    inversa = [0] * n
+    for fila, columna in enumerate(estado):
+        inversa[columna] = fila
+    inversa = tuple(inversa)
+    candidatos = []
+    for p in (estado, inversa):
+        complemento = tuple(n - 1 - c for c in p)
+        candidatos.extend((p, p[::-1], complemento, complemento[::-1]))
+    return min(candidatos)
+
+
+class ArchivoSoluciones(object):
+    """
+    Conjunto de soluciones distintas salvo simetrías, para cosechar soluciones
+    de varias corridas sin repetir tableros equivalentes.
+
+    archivo = ArchivoSoluciones(n, objetivo) donde objetivo es el número de
+    soluciones distintas que se quiere juntar (None si no hay límite).
+
+    Se puede guardar en un archivo binario compacto (un byte por reina si
+    n < 256) con guarda y recuperar con carga_archivo_soluciones.
+
+    """
+    def __init__(self, n, objetivo=None):
+        self.n = n
+        self.objetivo = objetivo
+        self.canonicas = set()
+
+    def __len__(self):
+        return len(self.canonicas)
+
+    def __contains__(self, estado):
+        return forma_canonica(estado) in self.canonicas
+
+    def agrega(self, estado):
+        """
+        Agrega un tablero (se supone que es solución)
+
+        @param estado: Una tupla que describe un estado
+
+        @return: True si el tablero no era equivalente a uno ya guardado
+
+        """
+        canonica = forma_canonica(estado)
+        if canonica in self.canonicas:
+            return False
+        self.canonicas.add(canonica)
+        return True
+
+    def completo(self):
+        """ @return: True si ya se alcanzó el número objetivo de soluciones """
+        return self.objetivo is not None and len(self.canonicas) >= self.objetivo
+
+    def guarda(self, ruta):
+        """
+        Guarda las soluciones en un archivo binario: un encabezado con n, el
+        objetivo (0 si no hay) y el número de soluciones, seguido de las
+        soluciones canónicas una tras otra.
+
+        @param ruta: Nombre del archivo
+
+        """
+        datos = array('B' if self.n < 256 else 'H')
+        for canonica in sorted(self.canonicas):
+            datos.extend(canonica)
+        with open(ruta, 'wb') as f:
+            f.write(pack('<III', self.n, self.objetivo or 0, len(self.canonicas)))
+            datos.tofile(f)
+
+
+def carga_archivo_soluciones(ruta):
+    """
+    Recupera un ArchivoSoluciones guardado con ArchivoSoluciones.guarda
+
+    @param ruta: Nombre del archivo
+
+    @return: Un objeto ArchivoSoluciones
+
+    """
+    with open(ruta, 'rb') as f:
+        n, objetivo, cuantas = unpack('<III', f.read(calcsize('<III')))
+        datos = array('B' if n < 256 else 'H')
+        datos.fromfile(f, n * cuantas)
+    archivo = ArchivoSoluciones(n, objetivo or None)
+    archivo.canonicas = set(tuple(datos[k:k + n]) for k in xrange(0, n * cuantas, n))
+    return archivo
+
+
+def cosecha_soluciones(problema, archivo, busqueda=blocales.descenso_colinas, max_intentos=1000):
+    """
+    Corre repetidamente un algoritmo de búsqueda y guarda en el archivo las
+    soluciones nuevas (salvo simetrías), hasta completar el objetivo del
+    archivo o agotar los intentos.
+
+    @param problema: Un objeto de la clase ProblemaNreinas
+    @param archivo: Un objeto de la clase ArchivoSoluciones
+    @param busqueda: Función que recibe el problema y devuelve un estado
+    @param max_intentos: Máximo número de corridas
+
+    @return: El número de soluciones nuevas agregadas
+
+    """
+    nuevas = 0
+    for _ in xrange(max_intentos):
+        if archivo.completo():
+            break
+        estado = busqueda(problema)
+        if problema.costo(estado) == 0 and archivo.agrega(estado):
+            nuevas += 1
+    return nuevas
+
+
+def temple_cadenas(problema, n_cadenas=100, calendarizador=lambda i: blocales.cal_expon(i, 100, 0.01),
+                   maxit=1000000, para_al_resolver=True):
+    """
+    Temple simulado con muchas cadenas independientes avanzando al mismo paso.
+
+    Los estados, los contadores de diagonales, los costos y los mejores
+    estados de todas las cadenas se guardan en listas paralelas. En cada
+    iteración todas las cadenas usan la misma temperatura, proponen un
+    intercambio de dos filas al azar, calculan su diferencia de costo en O(1)
+    con los contadores de diagonales y lo aceptan con el criterio de
+    Metropolis. Así cada iteración cuesta O(n_cadenas) en lugar de
+    O(n_cadenas * n^2) como al llamar temple_simulado por separado.
+
+    @param problema: Un objeto de la clase ProblemaNreinas
+    @param n_cadenas: Número de cadenas
+    @param calendarizador: Una función que recibe la iteración y devuelve la temperatura
+    @param maxit: Máximo número de iteraciones
+    @param para_al_resolver: Si es True se termina en cuanto alguna cadena llega a costo 0
+
+    @return: Una lista con una tupla (mejor estado, mejor costo) por cadena
+
+    """
+    n = problema.n
+    n1 = n - 1
+    estados = [list(problema.estado_aleatorio()) for _ in xrange(n_cadenas)]
+    diagonales, antidiagonales, costos = [], [], []
+    for estado in estados:
+        diag, anti = [0] * (2 * n - 1), [0] * (2 * n - 1)
+        for fila, columna in enumerate(estado):
+            diag[fila + columna] += 1
+            anti[fila - columna + n1] += 1
+        diagonales.append(diag)
+        antidiagonales.append(anti)
+        costos.append(sum(k * (k - 1) // 2 for k in diag) + sum(k * (k - 1) // 2 for k in anti))
+    mejores = [tuple(estado) for estado in estados]
+    c_mejores = list(costos)
+
+    if n < 2:
+        return zip(mejores, c_mejores)
+
+    aleatorio = random
+    resuelto = para_al_resolver and min(c_mejores) == 0
+    for it in xrange(maxit):
+        if resuelto:
+            break
+        temperatura = calendarizador(it)
+        if temperatura < 1e-8:
+            break
+
+        for c in xrange(n_cadenas):
+            estado, diag, anti = estados[c], diagonales[c], antidiagonales[c]
+            i = int(aleatorio() * n)
+            j = int(aleatorio() * n1)
+            if j >= i:
+                j += 1
+            a, b = estado[i], estado[j]
+
+            # Diferencia de costo: se quitan las dos reinas y se ponen intercambiadas
+            di, dj, ti, tj = i + a, j + b, i - a + n1, j - b + n1
+            diag[di] -= 1
+            anti[ti] -= 1
+            delta = -(diag[di] + anti[ti])
+            diag[dj] -= 1
+            anti[tj] -= 1
+            delta -= diag[dj] + anti[tj]
+            ndi, ndj, nti, ntj = i + b, j + a, i - b + n1, j - a + n1
+            delta += diag[ndi] + anti[nti]
+            diag[ndi] += 1
+            anti[nti] += 1
+            delta += diag[ndj] + anti[ntj]
+            diag[ndj] += 1
+            anti[ntj] += 1
+
+            if delta <= 0 or aleatorio() < exp(-delta / temperatura):
+                estado[i], estado[j] = b, a
+                costos[c] += delta
+                if costos[c] < c_mejores[c]:
+                    c_mejores[c] = costos[c]
+                    mejores[c] = tuple(estado)
+                    if para_al_resolver and costos[c] == 0:
+                        resuelto = True
+            else:
+                diag[ndi] -= 1
+                diag[ndj] -= 1
+                anti[nti] -= 1
+                anti[ntj] -= 1
+                diag[di] += 1
+                diag[dj] += 1
+                anti[ti] += 1
+                anti[tj] += 1
+
+    return zip(mejores, c_mejores)
+
+
 def prueba_descenso_colinas(problema=ProblemaNreinas(8), repeticiones=10):
     """ Prueba el algoritmo de descenso de colinas con n repeticiones """
 
@@ -100,6 +595,17 @@ def prueba_temple_simulado(problema=ProblemaNreinas(8), K=100, delta=0.01):
     print solucion
 
 
+def prueba_busqueda_tabu(problema=ProblemaNreinas(8), tenencia=10, n_candidatos=None):
+    """ Prueba el algoritmo de búsqueda tabú """
+
+    solucion = blocales.busqueda_tabu(problema, tenencia=tenencia, n_candidatos=n_candidatos, costo_minimo=0)
+    print u"\n\nUtilizando búsqueda tabú"
+    print "tenencia= ", tenencia, " y candidatos= ", n_candidatos
+    print u"\nEl costo de la solución utilizando búsqueda tabú es ", problema.costo(solucion)
+    print u"Y la solución es: "
+    print solucion
+
+
 if __name__ == "__main__":
 
     #prueba_descenso_colinas(ProblemaNreinas(32), 10)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+portafolio.py
+------------
+
+Portafolio de algoritmos: corre varios algoritmos de búsqueda en paralelo,
+cada uno en su propio proceso y sobre el mismo problema, y devuelve la
+primera solución que alcance el costo objetivo.
+
+Cada proceso repite su algoritmo (reinicios) mientras nadie haya alcanzado el
+objetivo. El mejor costo encontrado hasta el momento se comparte entre todos,
+y sólo se reportan al proceso principal las mejoras sobre ese valor.
+
+El algoritmo ganador se puede registrar en un archivo (una línea JSON por
+carrera) para construir, con ganadores_por_n, reglas de qué algoritmo usar
+según el tamaño del problema.
+
+"""
+
+import blocales
+import genetico
+import json
+import nreinas
+import time
+from multiprocessing import Event
+from multiprocessing import Lock
+from multiprocessing import Process
+from multiprocessing import Queue
+from multiprocessing import Value
+from Queue import Empty
+
+
+def genetico1(problema):
+    return genetico.GeneticoPermutaciones1(0.05).busqueda(problema, 50, 30)
+
+
+def genetico2(problema):
+    return genetico.GeneticoPermutaciones2(0.05).busqueda(problema, 50, 30)
+
+
+def temple(problema):
+    return blocales.temple_simulado(problema)
+
+
+def colinas(problema):
+    return blocales.descenso_colinas(problema)
+
+
+# Algoritmos por default, cada uno es una función que recibe el problema y devuelve un estado
+ALGORITMOS = [('genetico1', genetico1), ('genetico2', genetico2),
+              ('temple', temple), ('colinas', colinas)]
+
+
+def _trabajador(nombre, algoritmo, problema, objetivo, mejor, candado, parar, cola):
+    """ Repite el algoritmo y reporta las mejoras hasta que alguien alcance el objetivo """
+    while not parar.is_set():
+        estado = algoritmo(problema)
+        costo = problema.costo(estado)
+        with candado:
+            if costo >= mejor.value:
+                continue
+            mejor.value = costo
+        cola.put((nombre, estado, costo))
+        if costo <= objetivo:
+            parar.set()
+
+
+def carrera(problema, algoritmos=None, objetivo=0, tiempo_max=None, registro=None):
+    """
+    Corre los algoritmos del portafolio en paralelo hasta que alguno alcanza el
+    costo objetivo (o se agota el tiempo) y termina a los demás.
+
+    @param problema: Un objeto de una clase heredada de blocales.Problema
+    @param algoritmos: Lista de tuplas (nombre, función), ALGORITMOS por default.
+                       Un mismo algoritmo puede repetirse para darle más procesos.
+    @param objetivo: Costo con el que se detiene la carrera
+    @param tiempo_max: Segundos máximos de la carrera (None para no limitar)
+    @param registro: Archivo donde agregar una línea JSON con el resultado
+
+    @return: Una tupla (estado, costo, nombre del algoritmo ganador, tiempo)
+
+    """
+    if algoritmos is None:
+        algoritmos = ALGORITMOS
+
+    mejor = Value('d', float('inf'), lock=False)
+    candado, parar, cola = Lock(), Event(), Queue()
+    procesos = [Process(target=_trabajador,
+                        args=(nombre, algoritmo, problema, objetivo, mejor, candado, parar, cola))
+                for nombre, algoritmo in algoritmos]
+
+    tiempo_inicial = time.time()
+    for proceso in procesos:
+        proceso.daemon = True
+        proceso.start()
+
+    resultado = (None, float('inf'), None)
+    try:
+        while resultado[1] > objetivo:
+            restante = None if tiempo_max is None else tiempo_max - (time.time() - tiempo_inicial)
+            if restante is not None and restante <= 0:
+                break
+            try:
+                nombre, estado, costo = cola.get(timeout=restante if restante is not None else 1.0)
+            except Empty:
+                if not any(proceso.is_alive() for proceso in procesos):
+                    break
+                continue
+            if costo < resultado[1]:
+                resultado = (estado, costo, nombre)
+    finally:
+        parar.set()
+        for proceso in procesos:
+            proceso.terminate()
+        for proceso in procesos:
+            proceso.join()
+
+    tiempo = time.time() - tiempo_inicial
+    estado, costo, ganador = resultado
+
+    if registro is not None and ganador is not None:
+        with open(registro, 'a') as f:
+            f.write(json.dumps({'n': getattr(problema, 'n', None), 'ganador': ganador,
+                                'costo': costo, 'tiempo': tiempo,
+                                'algoritmos': [nombre for nombre, _ in algoritmos]}) + '\n')
+
+    return estado, costo, ganador, tiempo
+
+
+def ganadores_por_n(registro):
+    """
+    Resume un registro de carreras
+
+    @param registro: Archivo escrito por carrera
+
+    @return: Un diccionario {n: {nombre del algoritmo: carreras ganadas}}
+
+    """
+    resumen = {}
+    with open(registro) as f:
+        for linea in f:
+            if not linea.strip():
+                continue
+            r = json.loads(linea)
+            por_algoritmo = resumen.setdefault(r['n'], {})
+            por_algoritmo[r['ganador']] = por_algoritmo.get(r['ganador'], 0) + 1
+    return resumen
+
+
+def prueba_carrera(problema=nreinas.ProblemaNreinas(32), tiempo_max=60):
+    """ Prueba el portafolio con los algoritmos por default """
+
+    estado, costo, ganador, tiempo = carrera(problema, tiempo_max=tiempo_max)
+    print u"\n\nCarrera de algoritmos con ", problema.n, " reinas"
+    print u"Ganador: ", ganador
+    print u"Costo de la solución: ", costo
+    print u"Tiempo de ejecución en segundos: ", tiempo
+    print estado
+
+
+if __name__ == "__main__":
+
+    prueba_carrera(nreinas.ProblemaNreinas(32))
@@ -0,0 +1,328 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+servicio.py
+------------
+
+Servicio local para resolver n reinas desde otros procesos sin pagar el
+arranque del intérprete ni la importación de los módulos en cada corrida.
+
+El servicio escucha en un socket Unix y tiene un pool de procesos
+trabajadores ya iniciados. El protocolo es de líneas JSON: el cliente envía
+una petición
+
+    {"algoritmo": "temple", "n": 32, "parametros": {"K": 500}, "semilla": 1,
+     "plazo": 10}
+
+(algoritmo es una de las llaves de barrido.PARAMETROS y plazo son segundos,
+ambos opcionales salvo algoritmo y n) y recibe una línea por evento:
+
+    {"tipo": "progreso", "iteracion": ..., "costo": ...}   (cuando mejora)
+    {"tipo": "resultado", "solucion": [...], "costo": ..., "tiempo": ...}
+    {"tipo": "cancelado"}, {"tipo": "plazo"} o {"tipo": "error", "mensaje": ...}
+
+Las peticiones idénticas que llegan mientras otra igual está en curso se
+juntan en un solo trabajo y todos los clientes reciben sus eventos. Un
+cliente cancela enviando la línea {"cancelar": true} o cerrando la conexión;
+el trabajo sólo se interrumpe cuando ya no le quedan clientes.
+
+Uso:
+
+    python servicio.py /tmp/nreinas.sock -p 4
+
+y desde otro proceso:
+
+    for evento in servicio.resuelve({'algoritmo': 'temple', 'n': 32}, '/tmp/nreinas.sock'):
+        print evento
+
+"""
+
+import argparse
+import barrido
+import json
+import os
+import select
+import socket
+import SocketServer
+import threading
+import time
+import traceback
+from collections import deque
+from multiprocessing import Process
+from multiprocessing import Queue
+from multiprocessing import Value
+from Queue import Empty
+from Queue import Queue as ColaHilos
+
+
+# Cada cuántas llamadas de progreso revisa el trabajador si lo cancelaron
+REVISA_CANCELACION = 100
+
+
+class Cancelado(Exception):
+    pass
+
+
+def _trabajador(indice, entrada, salida, cancelar):
+    """
+    Proceso trabajador: recibe trabajos (id, petición) de su cola de entrada y
+    envía a la cola de salida tuplas (indice, id, tipo, datos).
+
+    """
+    while True:
+        trabajo = entrada.get()
+        if trabajo is None:
+            break
+        id_trabajo, peticion = trabajo
+        estado = {'llamadas': 0, 'mejor': None}
+
+        def progreso(iteracion, costo):
+            estado['llamadas'] += 1
+            if estado['llamadas'] % REVISA_CANCELACION == 0 and cancelar.value == id_trabajo:
+                raise Cancelado()
+            if estado['mejor'] is None or costo < estado['mejor']:
+                estado['mejor'] = costo
+                if cancelar.value == id_trabajo:
+                    raise Cancelado()
+                salida.put((indice, id_trabajo, 'progreso', {'iteracion': iteracion, 'costo': costo}))
+
+        try:
+            solucion, costo, tiempo, evaluaciones = barrido.corre(
+                peticion['algoritmo'], peticion.get('parametros', {}), peticion['n'],
+                peticion.get('semilla'), progreso)
+            salida.put((indice, id_trabajo, 'resultado',
+                        {'solucion': solucion, 'costo': costo, 'tiempo': tiempo,
+                         'evaluaciones': evaluaciones}))
+        except Cancelado:
+            salida.put((indice, id_trabajo, 'cancelado', {}))
+        except Exception as e:
+            traceback.print_exc()
+            salida.put((indice, id_trabajo, 'error', {'mensaje': str(e)}))
+
+
+class Despachador(object):
+    """
+    Reparte los trabajos entre los procesos trabajadores, junta las peticiones
+    idénticas en curso y reenvía los eventos a los clientes suscritos (cada
+    cliente es una cola de hilos).
+
+    """
+    def __init__(self, procesos=2):
+        self.salida = Queue()
+        self.entradas = [Queue() for _ in xrange(procesos)]
+        self.cancelar = [Value('i', -1) for _ in xrange(procesos)]
+        self.procesos = [Process(target=_trabajador, args=(k, self.entradas[k], self.salida,
+                                                           self.cancelar[k]))
+                         for k in xrange(procesos)]
+        for proceso in self.procesos:
+            proceso.daemon = True
+            proceso.start()
+
+        self.candado = threading.Lock()
+        self.trabajos = {}       # llave -> {'id', 'peticion', 'suscriptores', 'trabajador'}
+        self.por_id = {}         # id -> llave
+        self.pendientes = deque()
+        self.libres = range(procesos)
+        self.siguiente_id = 0
+
+        self.enrutador = threading.Thread(target=self._enruta)
+        self.enrutador.daemon = True
+        self.enrutador.start()
+
+    @staticmethod
+    def llave(peticion):
+        return json.dumps([peticion['algoritmo'], peticion['n'], peticion.get('parametros', {}),
+                           peticion.get('semilla')], sort_keys=True)
+
+    def suscribe(self, peticion, cola):
+        """ Suscribe una cola de eventos a la petición, creando el trabajo si no existe """
+        llave = self.llave(peticion)
+        with self.candado:
+            if llave not in self.trabajos:
+                self.siguiente_id += 1
+                self.trabajos[llave] = {'id': self.siguiente_id, 'peticion': peticion,
+                                        'suscriptores': set(), 'trabajador': None}
+                self.por_id[self.siguiente_id] = llave
+                self.pendientes.append(llave)
+                self._asigna()
+            trabajo = self.trabajos[llave]
+            # Si el trabajo estaba por cancelarse (se quedó sin suscriptores), se retoma
+            if trabajo['trabajador'] is not None and \
+                    self.cancelar[trabajo['trabajador']].value == trabajo['id']:
+                self.cancelar[trabajo['trabajador']].value = -1
+            trabajo['suscriptores'].add(cola)
+        return llave
+
+    def desuscribe(self, llave, cola):
+        """ Quita un suscriptor; si el trabajo se queda sin suscriptores se cancela """
+        with self.candado:
+            trabajo = self.trabajos.get(llave)
+            if trabajo is None:
+                return
+            trabajo['suscriptores'].discard(cola)
+            if trabajo['suscriptores']:
+                return
+            if trabajo['trabajador'] is None:
+                self.pendientes.remove(llave)
+                del self.trabajos[llave]
+                del self.por_id[trabajo['id']]
+            else:
+                self.cancelar[trabajo['trabajador']].value = trabajo['id']
+
+    def _asigna(self):
+        """ Asigna trabajos pendientes a trabajadores libres (con el candado tomado) """
+        while self.pendientes and self.libres:
+            llave = self.pendientes.popleft()
+            indice = self.libres.pop()
+            trabajo = self.trabajos[llave]
+            trabajo['trabajador'] = indice
+            self.entradas[indice].put((trabajo['id'], trabajo['peticion']))
+
+    def _enruta(self):
+        while True:
+            indice, id_trabajo, tipo, datos = self.salida.get()
+            datos['tipo'] = tipo
+            with self.candado:
+                llave = self.por_id.get(id_trabajo)
+                trabajo = self.trabajos.get(llave)
+                suscriptores = list(trabajo['suscriptores']) if trabajo else []
+                if tipo != 'progreso':
+                    if trabajo is not None:
+                        del self.trabajos[llave]
+                        del self.por_id[id_trabajo]
+                    self.libres.append(indice)
+                    self._asigna()
+            for cola in suscriptores:
+                cola.put(datos)
+
+    def cierra(self):
+        for entrada in self.entradas:
+            entrada.put(None)
+        for proceso in self.procesos:
+            proceso.join(1)
+            if proceso.is_alive():
+                proceso.terminate()
+
+
+class ManejadorPeticion(SocketServer.StreamRequestHandler):
+    """ Atiende una conexión: una petición y sus eventos """
+
+    # Sin búfer de lectura, para que select vea las líneas de cancelación aunque
+    # lleguen junto con la petición
+    rbufsize = 0
+
+    def handle(self):
+        try:
+            peticion = json.loads(self.rfile.readline())
+            peticion['algoritmo'], peticion['n']
+        except (ValueError, KeyError, TypeError):
+            self._envia({'tipo': 'error', 'mensaje': u'petición inválida'})
+            return
+        if peticion['algoritmo'] not in barrido.PARAMETROS:
+            self._envia({'tipo': 'error', 'mensaje': 'algoritmo desconocido'})
+            return
+
+        despachador = self.server.despachador
+        plazo = peticion.pop('plazo', None)
+        limite = None if plazo is None else time.time() + plazo
+        cola = ColaHilos()
+        llave = despachador.suscribe(peticion, cola)
+        try:
+            while True:
+                if limite is not None and time.time() >= limite:
+                    self._envia({'tipo': 'plazo'})
+                    return
+                if self._cancelado():
+                    self._envia({'tipo': 'cancelado'})
+                    return
+                try:
+                    evento = cola.get(timeout=0.05)
+                except Empty:
+                    continue
+                self._envia(evento)
+                if evento['tipo'] != 'progreso':
+                    return
+        except socket.error:
+            return
+        finally:
+            despachador.desuscribe(llave, cola)
+
+    def _cancelado(self):
+        """ Revisa sin bloquear si el cliente pidió cancelar o cerró la conexión """
+        listo, _, _ = select.select([self.connection], [], [], 0)
+        if not listo:
+            return False
+        linea = self.rfile.readline()
+        if not linea:
+            return True
+        try:
+            return bool(json.loads(linea).get('cancelar'))
+        except (ValueError, AttributeError):
+            return False
+
+    def _envia(self, evento):
+        self.wfile.write(json.dumps(evento) + '\n')
+        self.wfile.flush()
+
+
+class Servidor(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, ruta, procesos=2):
+        if os.path.exists(ruta):
+            os.remove(ruta)
+        self.despachador = Despachador(procesos)
+        SocketServer.UnixStreamServer.__init__(self, ruta, ManejadorPeticion)
+
+    def server_close(self):
+        SocketServer.UnixStreamServer.server_close(self)
+        self.despachador.cierra()
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+def resuelve(peticion, ruta):
+    """
+    Cliente: envía una petición al servicio y entrega sus eventos
+
+    @param peticion: Diccionario con la petición (ver el inicio del módulo)
+    @param ruta: Ruta del socket del servicio
+
+    @return: Un generador de diccionarios, uno por evento; el último es el
+             resultado (o cancelado, plazo o error). Si se cierra el generador
+             antes de terminar, el trabajo se cancela.
+
+    """
+    conexion = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    conexion.connect(ruta)
+    archivo = conexion.makefile('rb')
+    try:
+        conexion.sendall(json.dumps(peticion) + '\n')
+        for linea in archivo:
+            evento = json.loads(linea)
+            yield evento
+            if evento['tipo'] != 'progreso':
+                break
+    finally:
+        archivo.close()
+        conexion.close()
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description=u'Servicio local para resolver n reinas')
+    parser.add_argument('ruta', help=u'ruta del socket Unix')
+    parser.add_argument('-p', '--procesos', type=int, default=2, help=u'número de trabajadores')
+    args = parser.parse_args(argumentos)
+
+    servidor = Servidor(args.ruta, args.procesos)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+
+    main()
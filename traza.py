@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+traza.py
+------------
+
+Registro binario de la convergencia de una corrida, para analizarla sin
+agregar prints a los ciclos de Genetico.busqueda o temple_simulado.
+
+Cada registro son 5 flotantes de 64 bits (40 bytes):
+
+    iteración, mejor costo, costo actual, temperatura o diversidad, evaluaciones
+
+que se escriben directamente sobre un archivo mapeado en memoria, el cual
+crece al doble cuando se llena. El archivo empieza con un encabezado de 16
+bytes (identificador y número de registros).
+
+Ejemplo:
+
+    traza = Traza('temple.traza', cada=100)
+    blocales.temple_simulado(problema, maxit=100000, progreso=traza.progreso_temple(problema))
+    traza.cierra()
+    columnas = lee_traza('temple.traza')   # columnas['mejor'], columnas['temperatura'], ...
+
+"""
+
+import mmap
+from array import array
+from struct import calcsize
+from struct import pack_into
+from struct import unpack
+
+
+IDENTIFICADOR = 'TRAZA\x00\x00\x01'
+ENCABEZADO = '<8sQ'
+REGISTRO = '<5d'
+COLUMNAS = ('iteracion', 'mejor', 'actual', 'temperatura', 'evaluaciones')
+
+_TAM_ENCABEZADO = calcsize(ENCABEZADO)
+_TAM_REGISTRO = calcsize(REGISTRO)
+
+
+class Traza(object):
+    """
+    Grabador de trazas
+
+    traza = Traza(ruta, cada) donde cada indica cada cuántas llamadas de
+    progreso se guarda un registro (se guarda la primera y luego una de cada
+    'cada').
+
+    """
+    def __init__(self, ruta, cada=1, capacidad=4096):
+        self.ruta = ruta
+        self.cada = cada
+        self.registros = 0
+        self.capacidad = capacidad
+        self.archivo = open(ruta, 'w+b')
+        self.archivo.truncate(_TAM_ENCABEZADO + capacidad * _TAM_REGISTRO)
+        self.mapa = mmap.mmap(self.archivo.fileno(), 0)
+        self.evaluaciones = 0
+        self._contados = []      # (problema, costo de instancia original o None)
+
+    def registra(self, iteracion, mejor, actual, temperatura, evaluaciones):
+        """ Agrega un registro (sin muestreo) """
+        if self.registros == self.capacidad:
+            self.capacidad *= 2
+            self.mapa.resize(_TAM_ENCABEZADO + self.capacidad * _TAM_REGISTRO)
+        pack_into(REGISTRO, self.mapa, _TAM_ENCABEZADO + self.registros * _TAM_REGISTRO,
+                  iteracion, mejor, actual, temperatura, evaluaciones)
+        self.registros += 1
+
+    def cuenta_evaluaciones(self, problema):
+        """
+        Sustituye problema.costo por una versión que cuenta sus llamadas en
+        self.evaluaciones (cierra regresa el costo original)
+
+        """
+        self._contados.append((problema, vars(problema).get('costo')))
+        costo = problema.costo
+
+        def costo_contado(estado):
+            self.evaluaciones += 1
+            return costo(estado)
+
+        problema.costo = costo_contado
+
+    def progreso_temple(self, problema):
+        """
+        @return: Una función para el parámetro progreso de temple_simulado que
+                 registra la temperatura como cuarta columna
+
+        """
+        self.cuenta_evaluaciones(problema)
+        cada, registra = self.cada, self.registra
+
+        def progreso(iteracion, temperatura, costo, c_mejor):
+            if iteracion % cada == 0:
+                registra(iteracion, c_mejor, costo, temperatura, self.evaluaciones)
+
+        return progreso
+
+    def progreso_genetico(self, problema, algoritmo=None):
+        """
+        @param algoritmo: Si se da y la búsqueda se corre con mide_diversidad,
+                          se registra la distancia de Hamming promedio como
+                          cuarta columna (si no, NaN)
+
+        @return: Una función para el parámetro progreso de Genetico.busqueda. El
+                 costo actual es el mejor de la generación y el mejor costo es el
+                 mejor de todas las generaciones.
+
+        """
+        self.cuenta_evaluaciones(problema)
+        cada, registra = self.cada, self.registra
+        mejor = [float('inf')]
+
+        def progreso(generacion, costo):
+            mejor[0] = min(mejor[0], costo)
+            if generacion % cada == 0:
+                diversidad = getattr(algoritmo, 'diversidad', None)
+                registra(generacion, mejor[0], costo,
+                         diversidad[-1][0] if diversidad else float('nan'), self.evaluaciones)
+
+        return progreso
+
+    def cierra(self):
+        """
+        Escribe el encabezado, recorta el archivo al número de registros y
+        regresa el costo original a los problemas contados
+
+        """
+        while self._contados:
+            problema, costo = self._contados.pop()
+            if costo is None:
+                del problema.costo
+            else:
+                problema.costo = costo
+        pack_into(ENCABEZADO, self.mapa, 0, IDENTIFICADOR, self.registros)
+        self.mapa.flush()
+        self.mapa.close()
+        self.archivo.truncate(_TAM_ENCABEZADO + self.registros * _TAM_REGISTRO)
+        self.archivo.close()
+
+
+def lee_traza(ruta):
+    """
+    Lee una traza como columnas
+
+    @param ruta: Archivo escrito por Traza
+
+    @return: Un diccionario {nombre de columna: array('d')} con las columnas
+             de COLUMNAS
+
+    """
+    with open(ruta, 'rb') as f:
+        identificador, registros = unpack(ENCABEZADO, f.read(_TAM_ENCABEZADO))
+        if identificador != IDENTIFICADOR:
+            raise ValueError(ruta + " no es un archivo de traza")
+        datos = array('d')
+        datos.fromfile(f, registros * len(COLUMNAS))
+    return dict((nombre, datos[k::len(COLUMNAS)]) for k, nombre in enumerate(COLUMNAS))
@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+tsp.py
+------------
+
+El problema del agente viajero en forma de búsqueda local, con instancias
+en formato TSPLIB leídas de archivos locales.
+
+Las distancias se calculan una sola vez y se guardan en una matriz de enteros
+de 32 bits (n * n entradas contiguas). Para instancias grandes la matriz se
+guarda en un archivo temporal mapeado en memoria, de forma que el sistema
+operativo decide qué parte tener en RAM.
+
+"""
+
+import blocales
+import ctypes
+import mmap
+import tempfile
+from array import array
+from math import acos
+from math import ceil
+from math import cos
+from math import exp
+from math import pi
+from math import sqrt
+from random import sample
+from random import shuffle
+from itertools import combinations
+
+
+# Número de ciudades a partir del cual la matriz de distancias se mapea a disco
+N_MAPEO_DISCO = 5000
+
+
+class ProblemaTSP(blocales.Problema):
+    """
+    El agente viajero en forma de búsqueda local se inicializa como
+
+    entorno = ProblemaTSP(n, distancia)
+
+    donde n es el número de ciudades y distancia es una función que recibe dos
+    índices de ciudad y devuelve un entero. Normalmente se construye con
+    lee_tsplib(archivo).
+
+    Un estado es una permutación de range(n) con el orden en que se visitan las
+    ciudades, y su costo es la longitud del recorrido cerrado.
+
+    """
+    def __init__(self, n, distancia, nombre='', en_disco=None):
+        self.n = n
+        self.nombre = nombre
+        if en_disco is None:
+            en_disco = n >= N_MAPEO_DISCO
+        self._archivo = None
+        if en_disco:
+            self._archivo = tempfile.TemporaryFile()
+            self._archivo.truncate(4 * n * n)
+            self._mapa = mmap.mmap(self._archivo.fileno(), 4 * n * n)
+            self.d = (ctypes.c_int32 * (n * n)).from_buffer(self._mapa)
+        else:
+            self.d = array('i', [0]) * (n * n)
+        d = self.d
+        for i in xrange(n):
+            for j in xrange(i + 1, n):
+                d[i * n + j] = d[j * n + i] = distancia(i, j)
+
+    def distancia(self, i, j):
+        """
+        @return: La distancia entre las ciudades i y j
+
+        """
+        return self.d[i * self.n + j]
+
+    def estado_aleatorio(self):
+        estado = range(self.n)
+        shuffle(estado)
+        return tuple(estado)
+
+    def vecinos(self, estado):
+        """
+        Generador de los vecinos de un estado, permutando de dos en dos posiciones
+
+        @param estado: Una tupla que describe un estado
+
+        @return: Un generador de estados vecinos (utilizar yield en lugar de return)
+
+        """
+        edo_lista = list(estado)
+        for i, j in combinations(xrange(self.n), 2):
+            edo_lista[i], edo_lista[j] = edo_lista[j], edo_lista[i]
+            yield tuple(edo_lista)
+            edo_lista[i], edo_lista[j] = edo_lista[j], edo_lista[i]
+
+    def vecino_aleatorio(self, estado):
+        """
+        Genera un vecino de un estado invirtiendo un segmento aleatorio del
+        recorrido (movimiento 2-opt).
+
+        @param estado: Una tupla que describe un estado
+
+        @return: Una tupla con un estado vecino.
+        """
+        i, j = sorted(sample(xrange(self.n), 2))
+        return aplica_2opt(estado, i, j)
+
+    def intercambios(self, estado):
+        """
+        Generador de los pares de posiciones que se pueden intercambiar
+
+        @param estado: Una tupla que describe un estado
+
+        @return: Un generador de tuplas (i, j) con i < j
+
+        """
+        return combinations(xrange(self.n), 2)
+
+    def costo_intercambio(self, estado, i, j):
+        """
+        Calcula en O(1) la diferencia de costo al intercambiar las ciudades de
+        las posiciones i y j del recorrido. Sólo cambian las aristas que tocan
+        esas posiciones (a lo más cuatro).
+
+        @param estado: Una tupla que describe un estado
+        @param i: Primera posición a intercambiar
+        @param j: Segunda posición a intercambiar
+
+        @return: costo(vecino) - costo(estado)
+
+        """
+        n, d = self.n, self.d
+
+        def ciudad(k):
+            return estado[j] if k == i else estado[i] if k == j else estado[k]
+
+        delta = 0
+        for k in set(((i - 1) % n, i, (j - 1) % n, j)):
+            sig = (k + 1) % n
+            delta += d[ciudad(k) * n + ciudad(sig)] - d[estado[k] * n + estado[sig]]
+        return delta
+
+    def costo_2opt(self, estado, i, j):
+        """
+        Calcula en O(1) la diferencia de costo al invertir el segmento
+        estado[i:j + 1] del recorrido.
+
+        @param estado: Una tupla que describe un estado
+        @param i: Posición inicial del segmento
+        @param j: Posición final del segmento (i < j)
+
+        @return: costo(aplica_2opt(estado, i, j)) - costo(estado)
+
+        """
+        n, d = self.n, self.d
+        if i == 0 and j == n - 1:
+            return 0
+        a, b = estado[i - 1], estado[i]
+        c, e = estado[j], estado[(j + 1) % n]
+        return d[a * n + c] + d[b * n + e] - d[a * n + b] - d[c * n + e]
+
+    def costo(self, estado):
+        """
+        Calcula la longitud del recorrido cerrado
+
+        @param estado: Una tupla que describe un estado
+
+        @return: Un valor numérico, mientras más pequeño, mejor es el estado.
+
+        """
+        n, d = self.n, self.d
+        return sum(d[estado[k - 1] * n + estado[k]] for k in xrange(n))
+
+
+def aplica_2opt(estado, i, j):
+    """
+    Invierte el segmento estado[i:j + 1]
+
+    @param estado: Una tupla que describe un estado
+    @param i: Posición inicial del segmento
+    @param j: Posición final del segmento (i < j)
+
+    @return: Una tupla con el nuevo estado
+
+    """
+    return estado[:i] + estado[i:j + 1][::-1] + estado[j + 1:]
+
+
+def _nint(x):
+    return int(x + 0.5)
+
+
+def _euc_2d(a, b):
+    return _nint(sqrt((a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2))
+
+
+def _ceil_2d(a, b):
+    return int(ceil(sqrt((a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2)))
+
+
+def _man_2d(a, b):
+    return _nint(abs(a[0] - b[0]) + abs(a[1] - b[1]))
+
+
+def _max_2d(a, b):
+    return max(_nint(abs(a[0] - b[0])), _nint(abs(a[1] - b[1])))
+
+
+def _att(a, b):
+    r = sqrt(((a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2) / 10.0)
+    t = _nint(r)
+    return t + 1 if t < r else t
+
+
+def _geo(a, b):
+    def radianes(x):
+        grados = int(x)
+        return pi * (grados + 5.0 * (x - grados) / 3.0) / 180.0
+
+    lat_a, lon_a = radianes(a[0]), radianes(a[1])
+    lat_b, lon_b = radianes(b[0]), radianes(b[1])
+    q1 = cos(lon_a - lon_b)
+    q2 = cos(lat_a - lat_b)
+    q3 = cos(lat_a + lat_b)
+    return int(6378.388 * acos(0.5 * ((1.0 + q1) * q2 - (1.0 - q1) * q3)) + 1.0)
+
+
+DISTANCIAS_TSPLIB = {'EUC_2D': _euc_2d, 'CEIL_2D': _ceil_2d, 'MAN_2D': _man_2d,
+                     'MAX_2D': _max_2d, 'ATT': _att, 'GEO': _geo}
+
+
+def _matriz_explicita(pesos, n, formato):
+    """ Convierte la sección EDGE_WEIGHT_SECTION en una función de distancia """
+    if formato == 'FULL_MATRIX':
+        return lambda i, j: pesos[i * n + j]
+
+    if formato in ('UPPER_ROW', 'LOWER_COL'):
+        filas = ((i, j) for i in xrange(n) for j in xrange(i + 1, n))
+    elif formato in ('LOWER_ROW', 'UPPER_COL'):
+        filas = ((i, j) for i in xrange(n) for j in xrange(i))
+    elif formato in ('UPPER_DIAG_ROW', 'LOWER_DIAG_COL'):
+        filas = ((i, j) for i in xrange(n) for j in xrange(i, n))
+    elif formato in ('LOWER_DIAG_ROW', 'UPPER_DIAG_COL'):
+        filas = ((i, j) for i in xrange(n) for j in xrange(i + 1))
+    else:
+        raise ValueError("Formato EDGE_WEIGHT_FORMAT no soportado: " + formato)
+
+    tabla = {}
+    for (i, j), peso in zip(filas, pesos):
+        tabla[min(i, j), max(i, j)] = peso
+    return lambda i, j: tabla[min(i, j), max(i, j)]
+
+
+def lee_tsplib(archivo, en_disco=None):
+    """
+    Lee una instancia simétrica en formato TSPLIB (tipo TSP). Se soportan los
+    tipos de distancia EUC_2D, CEIL_2D, MAN_2D, MAX_2D, ATT, GEO y EXPLICIT.
+
+    @param archivo: Ruta al archivo .tsp
+    @param en_disco: Si es None se mapea la matriz a disco sólo para
+                     instancias con N_MAPEO_DISCO ciudades o más
+
+    @return: Un objeto ProblemaTSP
+
+    """
+    encabezado, coordenadas, pesos = {}, [], []
+    seccion = None
+    with open(archivo) as f:
+        for linea in f:
+            linea = linea.strip()
+            if not linea or linea == 'EOF':
+                continue
+            if linea.endswith('_SECTION'):
+                seccion = linea
+                continue
+            if ':' in linea:
+                llave, valor = linea.split(':', 1)
+                encabezado[llave.strip()] = valor.strip()
+                seccion = None
+            elif seccion == 'NODE_COORD_SECTION':
+                campos = linea.split()
+                coordenadas.append((float(campos[1]), float(campos[2])))
+            elif seccion == 'EDGE_WEIGHT_SECTION':
+                pesos.extend(int(float(p)) for p in linea.split())
+
+    n = int(encabezado['DIMENSION'])
+    tipo = encabezado.get('EDGE_WEIGHT_TYPE', 'EUC_2D')
+    if tipo == 'EXPLICIT':
+        distancia = _matriz_explicita(pesos, n, encabezado.get('EDGE_WEIGHT_FORMAT', 'FULL_MATRIX'))
+    elif tipo in DISTANCIAS_TSPLIB:
+        f_dist = DISTANCIAS_TSPLIB[tipo]
+        distancia = lambda i, j: f_dist(coordenadas[i], coordenadas[j])
+    else:
+        raise ValueError("Tipo EDGE_WEIGHT_TYPE no soportado: " + tipo)
+
+    return ProblemaTSP(n, distancia, encabezado.get('NAME', archivo), en_disco)
+
+
+def prueba_temple_simulado(problema, K=100, delta=0.001, maxit=1000000):
+    """ Prueba el algoritmo de temple simulado con calendarizador exponencial """
+
+    solucion = blocales.temple_simulado(problema, lambda i: K * exp(-delta * i), maxit)
+    print u"\n\nUtilizando temple simulado con calendarización exponencial en " + problema.nombre
+    print "K= ", K, " y delta= ", delta
+    print u"\nLa longitud del recorrido encontrado es ", problema.costo(solucion)
+    print u"Y el recorrido es: "
+    print solucion
+
+
+if __name__ == "__main__":
+
+    import sys
+    prueba_temple_simulado(lee_tsplib(sys.argv[1]), 1000, 0.0005)